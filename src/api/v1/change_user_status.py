@@ -1,7 +1,12 @@
-from fastapi import APIRouter, HTTPException, Depends, Body, status
-from src.core.token import jwt_token_validator
-from src.schemas import UserStatusChangeResponse, UserStatusChangeRequest
-from src.services.user_service import change_user_status
+from fastapi import APIRouter, Depends, Body, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.core.token import require_superuser
+from src.schemas import (
+    UserStatusChangeResponse, UserStatusChangeRequest,
+    BulkUserStatusChangeRequest, BulkUserStatusChangeResponse,
+)
+from src.services.user_service import change_user_status, change_users_status_bulk
+from src.session import get_request_session
 
 router = APIRouter()
 
@@ -13,7 +18,8 @@ async def block_user(
                 "login_to_change": "test_user_for_del",
             }
         ),
-        user_data: dict = Depends(jwt_token_validator)
+        user_data: dict = Depends(require_superuser),
+        session: AsyncSession = Depends(get_request_session),
 ):
     """
        Эндпоинт для блокирования пользователя в организации.
@@ -31,17 +37,13 @@ async def block_user(
        - **HTTPException 500**: Если произошла ошибка при работе с базой данных (обрабатывается глобально).
        """
     current_user_org_id = user_data.get("organization_id")
-    current_user_roles = user_data.get("roles", [])
     action = "block"
 
-    # 1. Проверка прав
-    if "superuser" not in current_user_roles:
-        raise HTTPException(status_code=403, detail="Недостаточно прав для блокирования пользователя")
-
     return await change_user_status(
         current_user_org_id=current_user_org_id,
         payload=payload,
-        action=action
+        action=action,
+        session=session,
     )
 
 
@@ -53,7 +55,8 @@ async def unblock_user(
                 "login_to_change": "test_user_for_del",
             }
         ),
-        user_data: dict = Depends(jwt_token_validator)
+        user_data: dict = Depends(require_superuser),
+        session: AsyncSession = Depends(get_request_session),
 ):
     """
     Эндпоинт для разблокирования пользователя в организации.
@@ -72,17 +75,13 @@ async def unblock_user(
     """
 
     current_user_org_id = user_data.get("organization_id")
-    current_user_roles = user_data.get("roles", [])
     action = "unblock"
 
-    # 1. Проверка прав
-    if "superuser" not in current_user_roles:
-        raise HTTPException(status_code=403, detail="Недостаточно прав для блокирования пользователя")
-
     return await change_user_status(
         current_user_org_id=current_user_org_id,
         payload=payload,
-        action=action
+        action=action,
+        session=session,
     )
 
 
@@ -94,7 +93,8 @@ async def delete_user(
                 "login_to_change": "test_user_for_del",
             }
         ),
-        user_data: dict = Depends(jwt_token_validator)
+        user_data: dict = Depends(require_superuser),
+        session: AsyncSession = Depends(get_request_session),
 ):
     """
     Эндпоинт для удаления пользователя из организации.
@@ -111,15 +111,123 @@ async def delete_user(
     - **HTTPException 500**: Если произошла ошибка при работе с базой данных (обрабатывается глобально).
     """
     current_user_org_id = user_data.get("organization_id")
-    current_user_roles = user_data.get("roles", [])
     action = "delete"
 
-    # 1. Проверка прав
-    if "superuser" not in current_user_roles:
-        raise HTTPException(status_code=403, detail="Недостаточно прав для создания пользователя")
-
     return await change_user_status(
         current_user_org_id=current_user_org_id,
         payload=payload,
-        action=action
+        action=action,
+        session=session,
+    )
+
+
+@router.post("/bulk/block", response_model=BulkUserStatusChangeResponse, status_code=status.HTTP_200_OK)
+async def block_users_bulk(
+        payload: BulkUserStatusChangeRequest = Body(
+            ...,
+            example={
+                "logins": ["test_user_1", "test_user_2"],
+                "user_ids": [42],
+            }
+        ),
+        user_data: dict = Depends(require_superuser),
+        session: AsyncSession = Depends(get_request_session),
+):
+    """
+    Эндпоинт для массового блокирования пользователей в организации.
+
+    Description:
+    - Одним запросом к БД помечает пользователей как заблокированных (is_blocked=True, is_active=False).
+    - Удалённые пользователи не изменяются.
+    - В той же транзакции отзываются refresh-токены заблокированных пользователей.
+    - Результат возвращается по каждому переданному логину/id; ненайденные пользователи не прерывают операцию.
+    - Требуется действующий JWT access_token с ролью 'superuser'.
+
+    Raises:
+    - **HTTPException 400**: Если список пуст или длиннее BULK_STATUS_CHANGE_MAX_ITEMS.
+    - **HTTPException 401**: Если access_token отсутствует, истёк или недействителен.
+    - **HTTPException 403**: Если у пользователя нет роли 'superuser'.
+    - **HTTPException 500**: Если произошла ошибка при работе с базой данных (обрабатывается глобально).
+    """
+    current_user_org_id = user_data.get("organization_id")
+
+    return await change_users_status_bulk(
+        current_user_org_id=current_user_org_id,
+        payload=payload,
+        action="block",
+        session=session,
+    )
+
+
+@router.post("/bulk/unblock", response_model=BulkUserStatusChangeResponse, status_code=status.HTTP_200_OK)
+async def unblock_users_bulk(
+        payload: BulkUserStatusChangeRequest = Body(
+            ...,
+            example={
+                "logins": ["test_user_1", "test_user_2"],
+                "user_ids": [42],
+            }
+        ),
+        user_data: dict = Depends(require_superuser),
+        session: AsyncSession = Depends(get_request_session),
+):
+    """
+    Эндпоинт для массового разблокирования пользователей в организации.
+
+    Description:
+    - Одним запросом к БД помечает пользователей как разблокированных (is_blocked=False, is_active=True).
+    - Удалённые пользователи не изменяются.
+    - Результат возвращается по каждому переданному логину/id; ненайденные пользователи не прерывают операцию.
+    - Требуется действующий JWT access_token с ролью 'superuser'.
+
+    Raises:
+    - **HTTPException 400**: Если список пуст или длиннее BULK_STATUS_CHANGE_MAX_ITEMS.
+    - **HTTPException 401**: Если access_token отсутствует, истёк или недействителен.
+    - **HTTPException 403**: Если у пользователя нет роли 'superuser'.
+    - **HTTPException 500**: Если произошла ошибка при работе с базой данных (обрабатывается глобально).
+    """
+    current_user_org_id = user_data.get("organization_id")
+
+    return await change_users_status_bulk(
+        current_user_org_id=current_user_org_id,
+        payload=payload,
+        action="unblock",
+        session=session,
+    )
+
+
+@router.delete("/bulk/delete", response_model=BulkUserStatusChangeResponse, status_code=status.HTTP_200_OK)
+async def delete_users_bulk(
+        payload: BulkUserStatusChangeRequest = Body(
+            ...,
+            example={
+                "logins": ["test_user_1", "test_user_2"],
+                "user_ids": [42],
+            }
+        ),
+        user_data: dict = Depends(require_superuser),
+        session: AsyncSession = Depends(get_request_session),
+):
+    """
+    Эндпоинт для массового удаления пользователей из организации.
+
+    Description:
+    - Одним запросом к БД помечает пользователей как удалённых (is_deleted=True).
+    - В той же транзакции отзываются refresh-токены удалённых пользователей.
+    - Результат возвращается по каждому переданному логину/id; ненайденные пользователи не прерывают операцию.
+    - Требуется действующий JWT access_token с ролью 'superuser'.
+
+    Raises:
+    - **HTTPException 400**: Если список пуст или длиннее BULK_STATUS_CHANGE_MAX_ITEMS.
+    - **HTTPException 401**: Если access_token отсутствует, истёк или недействителен.
+    - **HTTPException 403**: Если у пользователя нет роли 'superuser'.
+    - **HTTPException 500**: Если произошла ошибка при работе с базой данных (обрабатывается глобально).
+    """
+    current_user_org_id = user_data.get("organization_id")
+
+    return await change_users_status_bulk(
+        current_user_org_id=current_user_org_id,
+        payload=payload,
+        action="delete",
+        session=session,
     )
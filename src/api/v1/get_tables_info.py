@@ -1,13 +1,19 @@
 # src/api/v1/get_tables_info.py
 
-from fastapi import APIRouter, HTTPException
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, Query
 from src.services.check_test_conn import check_tables_info
 from src.core.logger import logger
 
 router = APIRouter()
 
 @router.get("/")
-async def get_tables_info():
+async def get_tables_info(
+    mode: Literal["estimate", "exact"] = Query(
+        "estimate", description="estimate — оценки из статистики Postgres, exact — точный count(*)"
+    ),
+):
     """
     Эндпоинт для проверки подключения таблиц и количества строк.
 
@@ -15,6 +21,9 @@ async def get_tables_info():
     - Эта ручка служит примером.
     - Проверяет все таблицы, зарегистрированные в конфиге TablesConfig.
     - Возвращает статус подключения к каждой таблице и количество строк.
+    - По умолчанию (`mode=estimate`) берёт оценки из pg_class/pg_stat_user_tables, не сканируя таблицы.
+    - `mode=exact` считает count(*) по таблицам параллельно, с таймаутом на каждую таблицу.
+    - Результат кэшируется на TABLES_INFO_CACHE_SECONDS секунд.
     - Удаление или измененять эту ручку не нужно
 
     Returns:
@@ -23,9 +32,9 @@ async def get_tables_info():
     Example Response:
     ```json
     {
-        "users": "Подключение успешно, строк: 42",
-        "organizations": "Подключение успешно, строк: 10",
-        "refresh_tokens": "Ошибка доступа к таблице: relation does not exist"
+        "User": "Connection OK, rows (estimate): 42",
+        "Role": "Connection OK, rows (estimate): 3",
+        "RefreshToken": "Error accessing table: relation does not exist"
     }
     ```
 
@@ -33,7 +42,7 @@ async def get_tables_info():
     - **HTTPException 500**: Если произошла ошибка при подключении к базе или получении информации о таблицах.
     """
     try:
-        result = await check_tables_info()
+        result = await check_tables_info(mode)
         return result
     except Exception as e:
         logger.error(f"Ошибка при получении информации о таблицах: {e}")
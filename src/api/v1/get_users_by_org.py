@@ -1,9 +1,13 @@
 # src/api/v1/get_users_by_org.py
-from fastapi import APIRouter, HTTPException, Depends
+from typing import Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.core.token import jwt_token_validator
 from src.schemas import UserResponse, GetUsersByOrgResponse
 from src.core.logger import logger
 from src.services.user_service import fetch_users_with_roles_and_permissions
+from src.session import get_request_session
 
 router = APIRouter()
 
@@ -12,25 +16,38 @@ router = APIRouter()
     "/{organization_id}/users",
     response_model=GetUsersByOrgResponse,
     summary="Get organization's users",
-    description="Возвращает список активных пользователей указанной организации с их ролями и разрешениями."
+    description="Возвращает постраничный список пользователей указанной организации с их ролями и разрешениями."
 )
 async def get_users_by_organization(
         organization_id: int,
-        user: dict = Depends(jwt_token_validator)
+        limit: int = Query(100, ge=1, le=500, description="Размер страницы"),
+        cursor: Optional[str] = Query(None, description="next_cursor из предыдущей страницы"),
+        role: Optional[str] = Query(None, description="Фильтр по роли"),
+        permission: Optional[str] = Query(None, description="Фильтр по коду права"),
+        status: Literal["active", "blocked", "deleted"] = Query("active", description="Фильтр по статусу"),
+        user: dict = Depends(jwt_token_validator),
+        session: AsyncSession = Depends(get_request_session),
 ):
     """
     Эндпоинт для получения списка пользователей организации.
 
     Description:
-    - Возвращает список активных пользователей указанной организации
+    - Возвращает пользователей указанной организации постранично (по умолчанию — активных)
     - Для каждого пользователя показывает его роли и разрешения
     - Поддерживает иерархию ролей через таблицу user_roles
-    - Фильтрует удаленных и неактивных пользователей
+    - Фильтрует по роли, праву и статусу на стороне БД
+    - Следующая страница запрашивается с `cursor` = `next_cursor` из ответа; `null` — страниц больше нет
 
     Parameters:
     - **organization_id** (integer, path): ID организации для получения списка пользователей
+    - **limit** (integer, query): Размер страницы, от 1 до 500
+    - **cursor** (string, query): Непрозрачный курсор следующей страницы
+    - **role** (string, query): Только пользователи с указанной ролью
+    - **permission** (string, query): Только пользователи с указанным правом
+    - **status** (string, query): `active`, `blocked` или `deleted`
 
     Raises:
+    - **HTTPException 400**: Если cursor некорректен
     - **HTTPException 401**: Если пользователь не авторизован (нет валидного токена)
     - **HTTPException 403**: Если пользователь не имеет доступа к организации
     - **HTTPException 404**: Если организация с указанным ID не найдена
@@ -41,7 +58,15 @@ async def get_users_by_organization(
     if current_user_org_id != organization_id:
         raise HTTPException(status_code=403, detail="Доступ к этой организации запрещён")
     try:
-        return await fetch_users_with_roles_and_permissions(organization_id)
+        return await fetch_users_with_roles_and_permissions(
+            organization_id,
+            limit=limit,
+            cursor=cursor,
+            role=role,
+            permission=permission,
+            user_status=status,
+            session=session,
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -1,20 +1,43 @@
-from fastapi import APIRouter, HTTPException
-from src.services.permissions_mapper import fetch_permissions_mapping
-from src.services.roles_service import get_all_roles
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from src.core.configuration.config import settings
+from src.services.permissions_mapper import fetch_permissions_mapping, permissions_snapshot
+from src.services.roles_service import get_all_roles, roles_snapshot
 from src.schemas import PermissionsResponse, RolesResponse
 from src.core.logger import logger
 
 router = APIRouter()
 
 
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def _conditional_response(request: Request, response: Response, payload: dict, etag: str):
+    """Отдаёт 304 Not Modified, если у клиента актуальная версия, иначе payload с ETag и Cache-Control."""
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={settings.REFERENCE_CACHE_MAX_AGE_SECONDS}",
+    }
+    if _etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    response.headers.update(headers)
+    return payload
+
+
 @router.get('/roles_list', response_model=RolesResponse)
-async def get_roles() -> RolesResponse:
+async def get_roles(request: Request, response: Response) -> RolesResponse:
     """
     Эндпоинт для получения данных для выпадающего списка ролей.
 
     Description:
     - Предназначен для фронтэнда для получения значений для выпадающего списка.
     - Возвращает `roles` — плоский список всех ролей, чтобы заполнить выпадающий список.
+    - Отдаётся из снимка в памяти; поддерживает `ETag` / `If-None-Match` (304 Not Modified).
 
     Returns:
     - **JSON**:
@@ -32,17 +55,19 @@ async def get_roles() -> RolesResponse:
     - **HTTPException 503**: При ошибке подключения к базе данных
     """
 
-    return await get_all_roles()
+    roles = await get_all_roles()
+    return _conditional_response(request, response, roles, roles_snapshot.etag)
 
 
 @router.get("/permissions_list", response_model=PermissionsResponse)
-async def get_permissions_list():
+async def get_permissions_list(request: Request, response: Response):
     """
         Эндпоинт для получения данных для выпадающего списка разрешений.
 
         Description:
         - Предназначен для фронтэнда для получения значений для выпадающего списка.
         - Возвращает `permissions` — плоский список всех кодов разрешений, чтобы заполнить выпадающий список.
+        - Отдаётся из снимка в памяти; поддерживает `ETag` / `If-None-Match` (304 Not Modified).
 
         Returns:
         - **JSON**:
@@ -60,7 +85,7 @@ async def get_permissions_list():
         """
     try:
         result = await fetch_permissions_mapping()
-        return result
+        return _conditional_response(request, response, result, permissions_snapshot.etag)
     except Exception as e:
         logger.error(f"Ошибка при получении информации о таблицах: {e}")
         raise HTTPException(
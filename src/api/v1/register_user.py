@@ -1,8 +1,10 @@
 # src/api/v1/register_user.py
-from fastapi import APIRouter, HTTPException, Depends, Body, status
-from src.core.token import jwt_token_validator
+from fastapi import APIRouter, Depends, Body, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.core.token import require_superuser
 from src.schemas import RegisterUserRequest, RegisterUserResponse
 from src.services.user_service import create_user_in_organization
+from src.session import get_request_session
 
 router = APIRouter()
 
@@ -19,7 +21,8 @@ async def register_user(
             "role": "user"
         }
     ),
-    user_data: dict = Depends(jwt_token_validator)
+    user_data: dict = Depends(require_superuser),
+    session: AsyncSession = Depends(get_request_session),
 ):
     """
     Эндпоинт для регистрации нового пользователя в организации.
@@ -37,11 +40,6 @@ async def register_user(
     - **HTTPException 500**: Если произошла ошибка при работе с базой данных (обрабатывается глобально).
     """
     current_user_org_id = user_data.get("organization_id")
-    current_user_roles = user_data.get("roles", [])
 
-    # 1. Проверка прав
-    if "superuser" not in current_user_roles:
-        raise HTTPException(status_code=403, detail="Недостаточно прав для создания пользователя")
-
-    # 2. Вызов сервисной функции для создания пользователя
-    return await create_user_in_organization(current_user_org_id, payload)
+    # Вызов сервисной функции для создания пользователя
+    return await create_user_in_organization(current_user_org_id, payload, session=session)
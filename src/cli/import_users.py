@@ -0,0 +1,295 @@
+# src/cli/import_users.py
+"""
+Массовый импорт пользователей организации из CSV или NDJSON.
+
+    python -m src.cli.import_users --org-id 1 --file users.csv
+    python -m src.cli.import_users --org-id 1 --file users.ndjson --format ndjson --workers 8
+
+Обязательные поля строки: login, password, email, first_name, last_name, role; nickname — необязательно.
+Файл читается потоково пачками по --batch-size строк. Пароли хешируются в пуле процессов,
+пачка загружается через COPY во временную staging-таблицу и переносится в users, user_roles
+и user_identifiers одним set-based запросом. Отклонённые строки с причиной пишутся в отчёт
+(по умолчанию <file>.rejects.csv).
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator
+
+from pydantic import EmailStr, TypeAdapter, ValidationError
+
+from src.core.logger import logger_manager
+from src.core.security.password import hash_password
+from src.db_clients.clients import get_db_connection
+from src.db_clients.config import db_settings
+from src.services.login_identifier_service import normalize_login_identifier
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ("login", "password", "email", "first_name", "last_name", "role")
+# Пароль используется как есть (API тоже не обрезает пробелы), остальные поля — без пробелов по краям
+STRIPPED_FIELDS = tuple(field for field in REQUIRED_FIELDS if field != "password")
+# Та же проверка email, что у RegisterUserRequest
+EMAIL_ADAPTER = TypeAdapter(EmailStr)
+STAGING_COLUMNS = ("line_no", "login", "email", "first_name", "last_name", "nickname", "password", "role_id")
+
+tables = db_settings.tables
+
+CREATE_STAGING = """
+    CREATE TEMP TABLE import_users_staging (
+        line_no integer PRIMARY KEY,
+        login text NOT NULL,
+        email text NOT NULL,
+        first_name text NOT NULL,
+        last_name text NOT NULL,
+        nickname text,
+        password text NOT NULL,
+        role_id integer NOT NULL
+    ) ON COMMIT DELETE ROWS
+"""
+
+# Строки, конфликтующие с уже существующими пользователями (по login/email, в том числе без учёта регистра)
+SELECT_CONFLICTS = f"""
+    SELECT s.line_no, s.login
+    FROM import_users_staging s
+    WHERE EXISTS (SELECT 1 FROM {tables.USERS} u WHERE u.login = s.login OR u.email = s.email)
+       OR EXISTS (
+            SELECT 1 FROM {tables.USER_IDENTIFIERS} ui
+            WHERE ui.kind IN ('login', 'email')
+              AND ui.identifier IN (lower(btrim(s.login)), lower(btrim(s.email)))
+       )
+"""
+
+MERGE_STAGING = f"""
+    WITH inserted AS (
+        INSERT INTO {tables.USERS} (
+            organization_id, login, first_name, last_name, nickname, email, password,
+            created_at, is_active, is_blocked, is_deleted
+        )
+        SELECT %(organization_id)s, s.login, s.first_name, s.last_name, s.nickname, s.email, s.password,
+               now(), true, false, false
+        FROM import_users_staging s
+        ORDER BY s.line_no
+        RETURNING id, login
+    ),
+    new_users AS (
+        SELECT i.id, s.login, s.email, s.nickname, s.role_id
+        FROM inserted i
+        JOIN import_users_staging s ON s.login = i.login
+    ),
+    new_roles AS (
+        INSERT INTO {tables.USER_ROLES} (user_id, role_id)
+        SELECT id, role_id FROM new_users
+    )
+    INSERT INTO {tables.USER_IDENTIFIERS} (user_id, kind, identifier)
+    SELECT DISTINCT ON (src.user_id, src.identifier) src.user_id, src.kind, src.identifier
+    FROM (
+        SELECT id AS user_id, 'login' AS kind, lower(btrim(login)) AS identifier, 0 AS priority FROM new_users
+        UNION ALL
+        SELECT id, 'email', lower(btrim(email)), 1 FROM new_users
+        UNION ALL
+        SELECT id, 'nickname', lower(btrim(nickname)), 2 FROM new_users WHERE nickname IS NOT NULL
+    ) AS src
+    ORDER BY src.user_id, src.identifier, src.priority
+"""
+
+
+def read_rows(path: Path, file_format: str) -> Iterator[tuple[int, dict]]:
+    """Потоково отдаёт (номер строки, запись) из CSV или NDJSON."""
+    with path.open(encoding="utf-8", newline="") as f:
+        if file_format == "csv":
+            # Строка 1 — заголовок
+            for line_no, row in enumerate(csv.DictReader(f), start=2):
+                yield line_no, row
+            return
+
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_no, {"__error__": f"invalid JSON: {e}"}
+                continue
+            yield line_no, row if isinstance(row, dict) else {"__error__": "JSON object expected"}
+
+
+class UserImporter:
+    def __init__(self, conn, organization_id: int, rejects_writer, workers: int):
+        self.conn = conn
+        self.organization_id = organization_id
+        self.rejects_writer = rejects_writer
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+
+        self.roles: dict[str, int] = {}
+        # Нормализованные идентификаторы, уже встреченные в файле
+        self.seen_identifiers: set[str] = set()
+
+        self.imported = 0
+        self.rejected = 0
+
+    def prepare(self) -> None:
+        with self.conn.cursor() as cur:
+            cur.execute(f"SELECT 1 FROM {tables.ORGANIZATIONS} WHERE id = %s", (self.organization_id,))
+            if cur.fetchone() is None:
+                raise SystemExit(f"Organization {self.organization_id} not found")
+
+            cur.execute(f"SELECT name, id FROM {tables.ROLES}")
+            self.roles = dict(cur.fetchall())
+
+            cur.execute(CREATE_STAGING)
+        self.conn.commit()
+
+    def reject(self, line_no: int, login, reason: str) -> None:
+        self.rejected += 1
+        self.rejects_writer.writerow([line_no, login or "", reason])
+
+    def validate(self, line_no: int, row: dict) -> dict | None:
+        """Проверки, не требующие БД. Возвращает нормализованную запись или None (строка отклонена)."""
+        if "__error__" in row:
+            self.reject(line_no, None, row["__error__"])
+            return None
+
+        values = {key: (str(row.get(key)) if row.get(key) is not None else "") for key in REQUIRED_FIELDS}
+        for key in STRIPPED_FIELDS:
+            values[key] = values[key].strip()
+        missing = [key for key, value in values.items() if not value]
+        if missing:
+            self.reject(line_no, values["login"], f"missing fields: {', '.join(missing)}")
+            return None
+
+        try:
+            values["email"] = EMAIL_ADAPTER.validate_python(values["email"])
+        except ValidationError:
+            self.reject(line_no, values["login"], f"invalid email '{values['email']}'")
+            return None
+
+        role_id = self.roles.get(values["role"])
+        if role_id is None:
+            self.reject(line_no, values["login"], f"unknown role '{values['role']}'")
+            return None
+
+        nickname = str(row.get("nickname") or "").strip() or None
+        # Никнеймы могут совпадать; уникальны только логины и email
+        identifiers = {normalize_login_identifier(values["login"]), normalize_login_identifier(values["email"])}
+        if identifiers & self.seen_identifiers:
+            self.reject(line_no, values["login"], "duplicate login/email within file")
+            return None
+        self.seen_identifiers |= identifiers
+
+        return {**values, "line_no": line_no, "nickname": nickname, "role_id": role_id}
+
+    def load_batch(self, batch: list[dict]) -> None:
+        hashes = self.executor.map(hash_password, [row["password"] for row in batch], chunksize=32)
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row, hashed in zip(batch, hashes):
+            writer.writerow([
+                row["line_no"], row["login"], row["email"], row["first_name"], row["last_name"],
+                row["nickname"] if row["nickname"] is not None else r"\N", hashed, row["role_id"],
+            ])
+        buffer.seek(0)
+
+        try:
+            with self.conn.cursor() as cur:
+                cur.copy_expert(
+                    f"COPY import_users_staging ({', '.join(STAGING_COLUMNS)}) "
+                    r"FROM STDIN WITH (FORMAT csv, NULL '\N')",
+                    buffer,
+                )
+
+                cur.execute(SELECT_CONFLICTS)
+                conflicts = cur.fetchall()
+                if conflicts:
+                    cur.execute(
+                        "DELETE FROM import_users_staging WHERE line_no = ANY(%s)",
+                        ([line_no for line_no, _ in conflicts],),
+                    )
+
+                cur.execute(MERGE_STAGING, {"organization_id": self.organization_id})
+                cur.execute("SELECT count(*) FROM import_users_staging")
+                imported = cur.fetchone()[0]
+            self.conn.commit()
+        except Exception as e:
+            # Пачка целиком откатывается — отмечаем все её строки
+            self.conn.rollback()
+            logger.error("Batch starting at line %s failed: %s", batch[0]["line_no"], e)
+            for row in batch:
+                self.reject(row["line_no"], row["login"], f"batch failed: {e}")
+            return
+
+        for line_no, login in conflicts:
+            self.reject(line_no, login, "user with this login/email already exists")
+        self.imported += imported
+
+    def run(self, rows: Iterator[tuple[int, dict]], batch_size: int) -> None:
+        self.prepare()
+        batch = []
+        started = time.monotonic()
+        for line_no, row in rows:
+            valid = self.validate(line_no, row)
+            if valid is None:
+                continue
+            batch.append(valid)
+            if len(batch) >= batch_size:
+                self.load_batch(batch)
+                batch = []
+                logger.info(
+                    "Imported %d users, rejected %d (%.0f users/s)",
+                    self.imported, self.rejected, self.imported / max(time.monotonic() - started, 1e-6),
+                )
+        if batch:
+            self.load_batch(batch)
+
+    def close(self) -> None:
+        self.executor.shutdown()
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Bulk import of organization users from CSV/NDJSON")
+    parser.add_argument("--org-id", type=int, required=True, help="ID организации")
+    parser.add_argument("--file", type=Path, required=True, help="CSV (с заголовком) или NDJSON")
+    parser.add_argument("--format", choices=("csv", "ndjson"), help="По умолчанию — по расширению файла")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Процессы для bcrypt")
+    parser.add_argument("--rejects", type=Path, help="Отчёт об отклонённых строках (по умолчанию <file>.rejects.csv)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logger_manager.ensure_configured()
+
+    file_format = args.format or ("ndjson" if args.file.suffix.lower() in (".ndjson", ".jsonl") else "csv")
+    rejects_path = args.rejects or args.file.with_name(args.file.name + ".rejects.csv")
+
+    conn = get_db_connection()
+    started = time.monotonic()
+    with rejects_path.open("w", encoding="utf-8", newline="") as rejects_file:
+        rejects_writer = csv.writer(rejects_file)
+        rejects_writer.writerow(["line", "login", "reason"])
+
+        importer = UserImporter(conn, args.org_id, rejects_writer, args.workers)
+        try:
+            importer.run(read_rows(args.file, file_format), args.batch_size)
+        finally:
+            importer.close()
+            conn.close()
+
+    logger.info(
+        "Import finished in %.1fs: %d imported, %d rejected (see %s)",
+        time.monotonic() - started, importer.imported, importer.rejected, rejects_path,
+    )
+    return 0 if importer.rejected == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+# src/cli/migrate.py
+"""
+Миграции схемы БД.
+
+    python -m src.cli.migrate           # применить недостающие шаги
+    python -m src.cli.migrate --list    # показать, какие шаги уже применены
+
+Шаги выполняются по порядку, каждый в своей транзакции, и отмечаются в таблице schema_migrations,
+поэтому повторный запуск безопасен. Индексы на таблицах, в которые пишет сервис, строятся
+CREATE INDEX CONCURRENTLY вне транзакции (transactional=False): запись на время сборки не блокируется,
+а прерванный шаг при повторном запуске продолжает с того же места. Проверки данных всех недостающих шагов выполняются до применения
+первого из них: если данные не подходят, схема остаётся нетронутой. Запускать при выкладке до старта новой версии сервиса:
+код опирается на таблицы, столбцы и индексы, которые создают эти шаги.
+"""
+import argparse
+import logging
+import sys
+import time
+from typing import Callable, NamedTuple, Optional
+
+from src.core.logger import logger_manager
+from src.db_clients.clients import get_db_connection
+from src.db_clients.config import db_settings
+from src.services.login_identifier_service import AMBIGUOUS_USER_IDENTIFIERS, BACKFILL_USER_IDENTIFIERS
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_TABLE = "schema_migrations"
+# Ключ advisory lock: миграции одновременно выполняет только один процесс
+MIGRATIONS_LOCK_KEY = 7_300_002
+
+tables = db_settings.tables
+
+
+class Migration(NamedTuple):
+    name: str
+    apply: Callable
+    # Проверка данных до применения любых шагов; бросает исключение, если шаг не выполнится
+    check: Optional[Callable] = None
+    # False — шаг выполняется в autocommit (CONCURRENTLY); его операторы должны быть идемпотентны
+    transactional: bool = True
+
+
+# Шаги в порядке применения
+MIGRATIONS: list[Migration] = []
+
+
+def migration(name: str, check: Optional[Callable] = None, transactional: bool = True):
+    """Регистрирует шаг миграции; имена задают порядок и не меняются после выкладки."""
+    def register(func: Callable) -> Callable:
+        MIGRATIONS.append(Migration(name, func, check, transactional))
+        return func
+    return register
+
+
+def create_index_concurrently(cur, name: str, definition: str, unique: bool = False) -> None:
+    """
+    Строит индекс без блокировки записи. Прерванная сборка CONCURRENTLY оставляет невалидный
+    индекс, который IF NOT EXISTS молча пропустил бы, — такой индекс удаляется и строится заново.
+    """
+    cur.execute(
+        "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = %s",
+        (name,),
+    )
+    row = cur.fetchone()
+    if row is not None and not row[0]:
+        logger.warning("Index %s is invalid after an interrupted build, rebuilding", name)
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    cur.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}")
+
+
+@migration("0001_user_identifiers")
+def create_user_identifiers(cur) -> None:
+    """Таблица идентификаторов входа и её заполнение для существующих пользователей."""
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {tables.USER_IDENTIFIERS} (
+            id serial PRIMARY KEY,
+            user_id integer NOT NULL REFERENCES {tables.USERS} (id) ON DELETE CASCADE,
+            kind varchar(16) NOT NULL,
+            identifier varchar NOT NULL
+        )
+    """)
+    # Индексы строятся после заполнения — так быстрее, чем поддерживать их при вставке
+    cur.execute(BACKFILL_USER_IDENTIFIERS)
+    logger.info("Backfilled %d login identifiers", cur.rowcount)
+    cur.execute(AMBIGUOUS_USER_IDENTIFIERS)
+    for identifier, kind, holders in cur.fetchall():
+        logger.warning(
+            "Login identifier %r (%s) is shared by %d users and was not backfilled", identifier, kind, holders
+        )
+    cur.execute(
+        f"CREATE INDEX IF NOT EXISTS ix_user_identifiers_identifier ON {tables.USER_IDENTIFIERS} (identifier)"
+    )
+    cur.execute(f"CREATE INDEX IF NOT EXISTS ix_user_identifiers_user_id ON {tables.USER_IDENTIFIERS} (user_id)")
+
+
+@migration("0002_refresh_token_digest")
+def store_refresh_token_digest(cur) -> None:
+    """refresh_tokens.token хранит SHA-256 (hex) вместо самого JWT; поиск при отзыве — по jti."""
+    # Значения переписываются до сужения типа: полный JWT в varchar(64) не помещается.
+    # Совпадает с jwt_utils.hash_refresh_token: sha256 от UTF-8 строки токена в hex.
+    cur.execute(f"""
+        UPDATE {tables.REFRESH_TOKENS}
+        SET token = encode(sha256(convert_to(token, 'UTF8')), 'hex')
+        WHERE token !~ '^[0-9a-f]{{64}}$'
+    """)
+    logger.info("Replaced %d stored refresh tokens with their digest", cur.rowcount)
+    cur.execute(f"ALTER TABLE {tables.REFRESH_TOKENS} ALTER COLUMN token TYPE varchar(64)")
+
+
+@migration("0003_refresh_token_maintenance", transactional=False)
+def add_refresh_token_maintenance_columns(cur) -> None:
+    """revoked_at и индексы, по которым отзыв и фоновая очистка находят токены."""
+    cur.execute(f"ALTER TABLE {tables.REFRESH_TOKENS} ADD COLUMN IF NOT EXISTS revoked_at timestamptz")
+    create_index_concurrently(cur, "ix_refresh_tokens_jti", f"{tables.REFRESH_TOKENS} (jti)", unique=True)
+    create_index_concurrently(cur, "ix_refresh_tokens_user_id", f"{tables.REFRESH_TOKENS} (user_id)")
+    create_index_concurrently(cur, "ix_refresh_tokens_expires_at", f"{tables.REFRESH_TOKENS} (expires_at)")
+    # Очистка отозванных токенов; истёкшие находит ix_refresh_tokens_expires_at
+    create_index_concurrently(
+        cur, "ix_refresh_tokens_revoked_at", f"{tables.REFRESH_TOKENS} (revoked_at) WHERE revoked"
+    )
+
+
+@migration("0004_users_keyset_index", transactional=False)
+def create_users_keyset_index(cur) -> None:
+    """Индекс keyset-пагинации пользователей организации."""
+    create_index_concurrently(cur, "ix_users_org_created_id", f"{tables.USERS} (organization_id, created_at, id)")
+
+
+def _require_unique(cur, table: str, column: str) -> None:
+    """Останавливает миграцию со списком дублей: уникальный индекс по таким данным не построится."""
+    cur.execute(f"""
+        SELECT {column}, count(*) FROM {table}
+        WHERE {column} IS NOT NULL
+        GROUP BY {column} HAVING count(*) > 1
+        ORDER BY count(*) DESC LIMIT 20
+    """)
+    duplicates = cur.fetchall()
+    if duplicates:
+        listed = ", ".join(f"{value!r} x{count}" for value, count in duplicates)
+        raise RuntimeError(f"Duplicate {table}.{column} values must be resolved before migrating: {listed}")
+
+
+def check_unique_logins_and_emails(cur) -> None:
+    _require_unique(cur, tables.USERS, "login")
+    _require_unique(cur, tables.USERS, "email")
+    _require_unique(cur, tables.ORGANIZATIONS, "email")
+
+
+@migration("0005_unique_logins_and_emails", check=check_unique_logins_and_emails, transactional=False)
+def create_unique_login_indexes(cur) -> None:
+    """Уникальность логинов, email и идентификаторов входа проверяет БД (нарушение -> 409)."""
+    create_index_concurrently(cur, "ix_users_login", f"{tables.USERS} (login)", unique=True)
+    create_index_concurrently(cur, "ix_users_email", f"{tables.USERS} (email)", unique=True)
+    create_index_concurrently(cur, "ix_organizations_email", f"{tables.ORGANIZATIONS} (email)", unique=True)
+    # Логин и email без учёта регистра принадлежат одному пользователю; никнеймы могут совпадать.
+    # Неоднозначные значения 0001 не заносит, поэтому индекс строится по заполненной таблице.
+    create_index_concurrently(
+        cur, "ix_user_identifiers_login_email",
+        f"{tables.USER_IDENTIFIERS} (identifier) WHERE kind IN ('login', 'email')", unique=True,
+    )
+
+
+def applied_migrations(cur) -> set[str]:
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+            name text PRIMARY KEY,
+            applied_at timestamptz NOT NULL DEFAULT now()
+        )
+    """)
+    cur.execute(f"SELECT name FROM {MIGRATIONS_TABLE}")
+    return {name for name, in cur.fetchall()}
+
+
+def _mark_applied(cur, name: str) -> None:
+    cur.execute(f"INSERT INTO {MIGRATIONS_TABLE} (name) VALUES (%s)", (name,))
+
+
+def _apply_in_transaction(conn, step: Migration) -> None:
+    try:
+        with conn.cursor() as cur:
+            step.apply(cur)
+            _mark_applied(cur, step.name)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        logger.error("Migration %s failed, nothing from this step was applied", step.name)
+        raise
+
+
+def _apply_in_autocommit(conn, step: Migration) -> None:
+    # CREATE INDEX CONCURRENTLY нельзя выполнить внутри транзакции
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            step.apply(cur)
+            _mark_applied(cur, step.name)
+    except Exception:
+        logger.error("Migration %s failed part-way; rerun the migrations to finish it", step.name)
+        raise
+    finally:
+        conn.autocommit = False
+
+
+def migrate(conn) -> int:
+    """Применяет недостающие шаги. Возвращает число применённых."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATIONS_LOCK_KEY,))
+        applied = applied_migrations(cur)
+    conn.commit()
+
+    pending = [step for step in MIGRATIONS if step.name not in applied]
+    count = 0
+    try:
+        try:
+            with conn.cursor() as cur:
+                for step in pending:
+                    if step.check is not None:
+                        step.check(cur)
+        finally:
+            conn.rollback()  # проверки только читают
+
+        for step in pending:
+            started = time.monotonic()
+            logger.info("Applying migration %s", step.name)
+            if step.transactional:
+                _apply_in_transaction(conn, step)
+            else:
+                _apply_in_autocommit(conn, step)
+            logger.info("Migration %s applied in %.1fs", step.name, time.monotonic() - started)
+            count += 1
+    finally:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATIONS_LOCK_KEY,))
+        conn.commit()
+    return count
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Apply database schema migrations")
+    parser.add_argument("--list", action="store_true", help="Только показать состояние шагов")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logger_manager.ensure_configured()
+
+    conn = get_db_connection()
+    try:
+        if args.list:
+            with conn.cursor() as cur:
+                applied = applied_migrations(cur)
+            conn.commit()
+            for name, *_ in MIGRATIONS:
+                print(f"[{'x' if name in applied else ' '}] {name}")
+            return 0
+
+        count = migrate(conn)
+    finally:
+        conn.close()
+
+    logger.info("%d migration(s) applied", count)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+# src/core/cache.py
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """
+    Ограниченный in-process кэш с TTL и вытеснением по LRU.
+
+    Рассчитан на работу внутри одного event loop воркера, поэтому обходится без блокировок.
+    Счётчик `version` увеличивается при каждой инвалидации: значение, загруженное
+    до инвалидации, не попадёт в кэш, если передать в `set` версию, снятую до загрузки.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, version: Optional[int] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        # Между снятием версии и записью была инвалидация — значение могло устареть
+        if version is not None and version != self.version:
+            return
+
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        self.version += 1
+        self._data.pop(key, None)
+
+    def invalidate_many(self, keys) -> None:
+        self.version += 1
+        for key in keys:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self.version += 1
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class SnapshotCache:
+    """
+    Снимок справочных данных в памяти воркера.
+
+    Загружается через loader не чаще раза в refresh_interval секунд (или после invalidate).
+    etag — хэш содержимого, пригодный для заголовка ETag. Если обновление не удалось,
+    отдаётся предыдущий снимок.
+    """
+
+    def __init__(self, name: str, loader: Callable[[], Awaitable[Any]], refresh_interval: float):
+        self.name = name
+        self.refresh_interval = refresh_interval
+        self.etag: Optional[str] = None
+
+        self._loader = loader
+        self._value: Any = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _is_fresh(self) -> bool:
+        return self._value is not None and time.monotonic() - self._loaded_at < self.refresh_interval
+
+    async def get(self) -> Any:
+        if self._is_fresh():
+            return self._value
+
+        async with self._lock:
+            if self._is_fresh():
+                return self._value
+            try:
+                value = await self._loader()
+            except Exception as e:
+                if self._value is None:
+                    raise
+                logger.warning(f"Failed to refresh {self.name} snapshot, serving previous one: {e}")
+                self._loaded_at = time.monotonic()
+                return self._value
+
+            digest = hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+            self._value = value
+            self.etag = f'"{digest[:32]}"'
+            self._loaded_at = time.monotonic()
+            return value
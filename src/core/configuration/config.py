@@ -9,17 +9,74 @@ class Settings:
         env.read_env()
 
         self.LOGGER_LEVEL = logging.DEBUG if env.bool("DEBUG", False) else logging.INFO
+        # Ёмкость очереди логов; при переполнении записи отбрасываются
+        self.LOG_QUEUE_SIZE = env.int("LOG_QUEUE_SIZE", 10000)
+        # Прореживание частых сообщений (ошибки токенов и т.п.): 1 из N и сводка раз в T секунд
+        self.LOG_SAMPLE_EVERY_N = env.int("LOG_SAMPLE_EVERY_N", 100)
+        self.LOG_SUMMARY_INTERVAL_SECONDS = env.float("LOG_SUMMARY_INTERVAL_SECONDS", 60.0)
         self.PUBLIC_OR_LOCAL = env.str("PUBLIC_OR_LOCAL", "LOCAL")
         self.SERVICE_NAME = env.str("SERVICE_NAME", "db_template")
 
         self.HOST = env.str("HOST", '0.0.0.0')
         self.PORT = env.int('PORT', 7070)
+        self.WORKERS = env.int("WORKERS", 4)
 
         self.JWT_SECRET_KEY = env.str("JWT_SECRET_KEY", "") 
         self.JWT_ALGORITHM = env.str("JWT_ALGORITHM", "HS256")
         self.ACCESS_TOKEN_EXPIRE_MINUTES = env.int("ACCESS_TOKEN_EXPIRE_MINUTES", 15)
         self.REFRESH_TOKEN_EXPIRE_DAYS = env.int("REFRESH_TOKEN_EXPIRE_DAYS", 30)
 
+        # Фоновая очистка refresh_tokens: интервал, размер пачки DELETE и пауза между пачками
+        self.TOKEN_MAINTENANCE_ENABLED = env.bool("TOKEN_MAINTENANCE_ENABLED", True)
+        self.TOKEN_MAINTENANCE_INTERVAL_SECONDS = env.int("TOKEN_MAINTENANCE_INTERVAL_SECONDS", 3600)
+        self.TOKEN_PURGE_BATCH_SIZE = env.int("TOKEN_PURGE_BATCH_SIZE", 5000)
+        self.TOKEN_PURGE_BATCH_PAUSE_SECONDS = env.float("TOKEN_PURGE_BATCH_PAUSE_SECONDS", 0.5)
+        self.REVOKED_TOKEN_RETENTION_HOURS = env.int("REVOKED_TOKEN_RETENTION_HOURS", 24)
+        # Максимум действующих refresh-токенов на пользователя (0 — без ограничения)
+        self.MAX_ACTIVE_SESSIONS_PER_USER = env.int("MAX_ACTIVE_SESSIONS_PER_USER", 10)
+
+        # Stateless-режим: организация, роли и права передаются подписанными claims в access-токене
+        self.STATELESS_ACCESS_TOKENS = env.bool("STATELESS_ACCESS_TOKENS", False)
+        # Версия модели прав: токены с другой версией проверяются через БД
+        self.ACCESS_TOKEN_CLAIMS_VERSION = env.int("ACCESS_TOKEN_CLAIMS_VERSION", 1)
+
+        # Пул для bcrypt: thread или process, число воркеров и размер очереди ожидания
+        self.PASSWORD_HASH_EXECUTOR = env.str("PASSWORD_HASH_EXECUTOR", "thread")
+        self.PASSWORD_HASH_WORKERS = env.int("PASSWORD_HASH_WORKERS", 4)
+        self.PASSWORD_HASH_QUEUE_SIZE = env.int("PASSWORD_HASH_QUEUE_SIZE", 64)
+
+        # Справочники ролей и прав: период обновления снимка и max-age для клиентов.
+        # Роли и права меняются только напрямую в БД, поэтому изменения видны не позже чем через REFRESH_SECONDS
+        self.REFERENCE_CACHE_REFRESH_SECONDS = env.float("REFERENCE_CACHE_REFRESH_SECONDS", 300.0)
+        self.REFERENCE_CACHE_MAX_AGE_SECONDS = env.int("REFERENCE_CACHE_MAX_AGE_SECONDS", 60)
+
+        # Диагностика /tables-info: кэш результата, таймаут и параллелизм точного подсчёта
+        self.TABLES_INFO_CACHE_SECONDS = env.float("TABLES_INFO_CACHE_SECONDS", 60.0)
+        self.TABLES_INFO_EXACT_TIMEOUT_SECONDS = env.float("TABLES_INFO_EXACT_TIMEOUT_SECONDS", 5.0)
+        self.TABLES_INFO_EXACT_CONCURRENCY = env.int("TABLES_INFO_EXACT_CONCURRENCY", 4)
+
+        # Метрики /metrics: каталог снимков воркеров (по умолчанию во временном каталоге) и период их записи
+        self.METRICS_DIR = env.str("METRICS_DIR", "")
+        self.METRICS_FLUSH_INTERVAL_SECONDS = env.float("METRICS_FLUSH_INTERVAL_SECONDS", 5.0)
+
+        # Server-Timing (db/hash/jwt) в ответах и порог записи медленных запросов в лог
+        self.SERVER_TIMING_HEADER_ENABLED = env.bool("SERVER_TIMING_HEADER_ENABLED", True)
+        self.SLOW_REQUEST_THRESHOLD_SECONDS = env.float("SLOW_REQUEST_THRESHOLD_SECONDS", 1.0)
+
+        # Максимум логинов/id в одном запросе массовой смены статуса пользователей
+        self.BULK_STATUS_CHANGE_MAX_ITEMS = env.int("BULK_STATUS_CHANGE_MAX_ITEMS", 1000)
+
+        # Окно, в котором повтор уже использованного refresh токена получает ту же новую пару (0 — выключено)
+        self.REFRESH_REUSE_GRACE_SECONDS = env.float("REFRESH_REUSE_GRACE_SECONDS", 10.0)
+        self.REFRESH_REUSE_CACHE_MAXSIZE = env.int("REFRESH_REUSE_CACHE_MAXSIZE", 10000)
+
+        # Кэш принципалов (организация, роли, права, статус) в JWTTokenValidator.
+        # Кэш у каждого воркера свой, инвалидация после изменения пользователя — только в воркере,
+        # который его изменил: остальные принимают заблокированного/удалённого пользователя
+        # ещё до PRINCIPAL_CACHE_TTL_SECONDS. TTL — это допустимая задержка отзыва доступа.
+        self.PRINCIPAL_CACHE_TTL_SECONDS = env.float("PRINCIPAL_CACHE_TTL_SECONDS", 30.0)
+        self.PRINCIPAL_CACHE_MAXSIZE = env.int("PRINCIPAL_CACHE_MAXSIZE", 10000)
+
     def get_origins_urls(self):
         if self.PUBLIC_OR_LOCAL == 'PUBLIC':
             return 'http://11.11.11.11'
@@ -4,7 +4,11 @@ from fastapi import FastAPI, HTTPException, Request, status
 from fastapi.responses import JSONResponse
 from sqlalchemy.exc import DatabaseError, SQLAlchemyError
 
+from src.core.log_sampling import SampledLogger
+
 logger = logging.getLogger(__name__) 
+# 401 по просроченным токенам приходят массово — пишем выборочно; остальные 4xx (403, 404, 409...) — полностью
+unauthorized_log = SampledLogger(logger, "http.unauthorized")
 
 def register_exception_handlers(app: FastAPI) -> None:
     """
@@ -13,12 +17,17 @@ def register_exception_handlers(app: FastAPI) -> None:
 
     @app.exception_handler(HTTPException)
     async def http_exception_handler(request: Request, exc: HTTPException):
-        logger.warning(f"HTTPException {exc.status_code} at {request.url}: {exc.detail}")
+        if exc.status_code >= 500:
+            logger.error("HTTPException %s at %s: %s", exc.status_code, request.url, exc.detail)
+        elif exc.status_code == status.HTTP_401_UNAUTHORIZED:
+            unauthorized_log.warning("HTTPException %s at %s: %s", exc.status_code, request.url.path, exc.detail)
+        else:
+            logger.warning("HTTPException %s at %s: %s", exc.status_code, request.url.path, exc.detail)
         return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
 
     @app.exception_handler(DatabaseError)
     async def database_error_handler(request: Request, exc: DatabaseError):
-        logger.error(f"DatabaseError at {request.url}: {exc}")
+        logger.error("DatabaseError at %s: %s", request.url, exc)
         return JSONResponse(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             content={"detail": "Ошибка подключения к базе данных"},
@@ -26,7 +35,7 @@ def register_exception_handlers(app: FastAPI) -> None:
 
     @app.exception_handler(SQLAlchemyError)
     async def sqlalchemy_error_handler(request: Request, exc: SQLAlchemyError):
-        logger.error(f"SQLAlchemyError at {request.url}: {exc}")
+        logger.error("SQLAlchemyError at %s: %s", request.url, exc)
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"detail": "Ошибка выполнения запроса к базе данных"},
@@ -35,7 +44,7 @@ def register_exception_handlers(app: FastAPI) -> None:
     @app.exception_handler(Exception)
     async def unhandled_exception_handler(request: Request, exc: Exception):
         # Последний рубеж для единого ответа 500
-        logger.error(f"Unhandled exception at {request.url}: {exc}", exc_info=True)
+        logger.error("Unhandled exception at %s: %s", request.url, exc, exc_info=True)
         return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"detail": "Внутренняя ошибка сервера"},
@@ -0,0 +1,86 @@
+# src/core/log_sampling.py
+import asyncio
+import logging
+import time
+
+from src.core.configuration.config import settings
+
+# Все созданные сэмплеры: сводки пропущенных сообщений сбрасываются по таймеру и при остановке
+_samplers: list["SampledLogger"] = []
+
+
+class SampledLogger:
+    """
+    Прореживает однотипные сообщения одной точки вызова.
+
+    Пишет первое и каждое every_n-е сообщение, остальные только считает; не чаще раза
+    в summary_interval секунд добавляет сводку о том, сколько сообщений было пропущено.
+    Сводку пишет следующий вызов либо log_summary_loop / flush_summaries при остановке.
+    Сообщения форматируются лениво (%-стиль) и только если действительно пишутся.
+    """
+
+    def __init__(self, logger: logging.Logger, name: str, every_n: int | None = None,
+                 summary_interval: float | None = None):
+        self.logger = logger
+        self.name = name
+        self.every_n = max(1, every_n or settings.LOG_SAMPLE_EVERY_N)
+        self.summary_interval = summary_interval or settings.LOG_SUMMARY_INTERVAL_SECONDS
+
+        self.seen = 0
+        self.suppressed = 0
+        self._level = logging.INFO
+        self._window_started = time.monotonic()
+        _samplers.append(self)
+
+    def flush_summary(self, force: bool = False) -> None:
+        """Пишет сводку о пропущенных сообщениях, если окно истекло (или сразу при force)."""
+        now = time.monotonic()
+        if not force and now - self._window_started < self.summary_interval:
+            return
+        if self.suppressed:
+            self.logger.log(
+                self._level,
+                "[%s] suppressed %d similar messages in the last %.0fs",
+                self.name, self.suppressed, now - self._window_started,
+            )
+        self.suppressed = 0
+        self._window_started = now
+
+    def _log(self, level: int, msg: str, args, kwargs) -> None:
+        if not self.logger.isEnabledFor(level):
+            return
+
+        self._level = level
+        self.flush_summary()
+
+        self.seen += 1
+        if (self.seen - 1) % self.every_n == 0:
+            # 1 — _log, 2 — log/warning/..., 3 — место вызова
+            self.logger.log(level, msg, *args, stacklevel=3, **kwargs)
+        else:
+            self.suppressed += 1
+
+    def log(self, level: int, msg: str, *args, **kwargs) -> None:
+        self._log(level, msg, args, kwargs)
+
+    def debug(self, msg: str, *args, **kwargs) -> None:
+        self._log(logging.DEBUG, msg, args, kwargs)
+
+    def info(self, msg: str, *args, **kwargs) -> None:
+        self._log(logging.INFO, msg, args, kwargs)
+
+    def warning(self, msg: str, *args, **kwargs) -> None:
+        self._log(logging.WARNING, msg, args, kwargs)
+
+
+def flush_summaries(force: bool = False) -> None:
+    """Сбрасывает сводки всех сэмплеров; force=True — при остановке, не дожидаясь конца окна."""
+    for sampler in _samplers:
+        sampler.flush_summary(force=force)
+
+
+async def log_summary_loop() -> None:
+    """Периодически сбрасывает сводки, чтобы прекратившийся всплеск тоже попал в журнал."""
+    while True:
+        await asyncio.sleep(settings.LOG_SUMMARY_INTERVAL_SECONDS)
+        flush_summaries()
@@ -1,29 +1,55 @@
 # src/core/logger.py
+import atexit
 import logging
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 
 from src.core.configuration.config import settings
+from src.core.metrics import log_queue_size, log_records_dropped_total, metrics
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler с ограниченной очередью: при переполнении запись отбрасывается и учитывается в dropped,
+    поэтому поток, который пишет лог, никогда не ждёт диск.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Слушатель работает в том же процессе — форматирование выполнят его обработчики
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
 
 
 class LoggerManager:
     def __init__(self):
         self.LOG_DIR = Path("logs")
-        self.LOG_DIR.mkdir(exist_ok=True)
 
         self.FORMAT = f"[%(asctime)s] [%(levelname)s] [{settings.SERVICE_NAME}] %(message)s"
         self.DATE_FMT = "%Y-%m-%d %H:%M:%S"
 
-    def _add_console_handler(self, logger: logging.Logger, formatter: logging.Formatter) -> None:
+        self.queue_handler: DroppingQueueHandler | None = None
+        self.listener: QueueListener | None = None
+
+    def _add_console_handler(self, handlers: list[logging.Handler], formatter: logging.Formatter) -> None:
         console_handler = logging.StreamHandler(sys.stdout)
         console_handler.setLevel(logging.INFO)
         console_handler.setFormatter(formatter)
-        logger.addHandler(console_handler)
+        handlers.append(console_handler)
 
     def _add_file_handler(
             self,
-            logger: logging.Logger,
+            handlers: list[logging.Handler],
             formatter: logging.Formatter,
             handler_type: str,
             level: int,
@@ -39,27 +65,73 @@ class LoggerManager:
             handler.setLevel(level)
             handler.setFormatter(formatter)
             handler.addFilter(filter_func)
-            logger.addHandler(handler)
+            handlers.append(handler)
         except Exception as e:
             print(f"Failed to setup {handler_type} file handler: {e}")
 
     def setup_logger(self) -> logging.Logger:
+        """
+        Настраивает корневой логгер: записи попадают в ограниченную очередь,
+        а консоль и файлы обслуживает QueueListener в фоновом потоке.
+        Вызывается при старте приложения (lifespan), а не при импорте модуля.
+        """
         logger = logging.getLogger()
-        
+
         for handler in logger.handlers[:]:
             logger.removeHandler(handler)
+        self.stop()
 
-        logger.setLevel(logging.DEBUG)
+        logger.setLevel(settings.LOGGER_LEVEL)
+        self.LOG_DIR.mkdir(exist_ok=True)
         formatter = logging.Formatter(fmt=self.FORMAT, datefmt=self.DATE_FMT)
 
-        self._add_console_handler(logger, formatter)
-        self._add_file_handler(logger, formatter, "info", logging.INFO, lambda r: r.levelno == logging.INFO)
-        self._add_file_handler(logger, formatter, "debug", logging.DEBUG, lambda r: r.levelno <= logging.DEBUG)
-        self._add_file_handler(logger, formatter, "error", logging.ERROR, lambda r: r.levelno >= logging.ERROR)
+        handlers: list[logging.Handler] = []
+        self._add_console_handler(handlers, formatter)
+        self._add_file_handler(handlers, formatter, "info", logging.INFO, lambda r: r.levelno == logging.INFO)
+        self._add_file_handler(handlers, formatter, "debug", logging.DEBUG, lambda r: r.levelno <= logging.DEBUG)
+        self._add_file_handler(handlers, formatter, "error", logging.ERROR, lambda r: r.levelno >= logging.ERROR)
+
+        log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+        self.queue_handler = DroppingQueueHandler(log_queue)
+        logger.addHandler(self.queue_handler)
+
+        self.listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.stop)
 
         return logger
 
+    @property
+    def configured(self) -> bool:
+        return self.listener is not None
+
+    def ensure_configured(self) -> logging.Logger:
+        return logging.getLogger() if self.configured else self.setup_logger()
+
+    def stop(self) -> None:
+        """Останавливает фоновый поток, дописав записи, оставшиеся в очереди."""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def stats(self) -> dict:
+        if self.queue_handler is None:
+            return {"queued": 0, "dropped": 0}
+        return {
+            "queued": self.queue_handler.queue.qsize(),
+            "dropped": self.queue_handler.dropped,
+        }
+
 
 logger_manager = LoggerManager()
-logger = logger_manager.setup_logger()
-logger.setLevel(settings.LOGGER_LEVEL)
\ No newline at end of file
+
+
+def collect_logging_metrics() -> None:
+    stats = logger_manager.stats()
+    log_queue_size.set(stats["queued"])
+    log_records_dropped_total.set(stats["dropped"])
+
+
+metrics.add_collector(collect_logging_metrics)
+# Корневой логгер; обработчики подключает logger_manager.setup_logger() при старте приложения
+logger = logging.getLogger()
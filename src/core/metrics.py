@@ -0,0 +1,362 @@
+# src/core/metrics.py
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterable
+
+from src.core.configuration.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple, object] = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def dump(self) -> dict:
+        return {
+            "type": self.type,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "samples": [[list(key), value] for key, value in self._values.items()],
+        }
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set(self, value: float, **labels) -> None:
+        """Для счётчиков, которые ведутся в другом месте и только публикуются здесь."""
+        self._values[self._key(labels)] = float(value)
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        sample = self._values.get(key)
+        if sample is None:
+            sample = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+
+        # Храним некумулятивные счётчики по корзинам, кумулятивными они становятся при выводе
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                sample["buckets"][i] += 1
+                break
+        sample["sum"] += value
+        sample["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def dump(self) -> dict:
+        data = super().dump()
+        data["buckets"] = list(self.buckets)
+        return data
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_float(value: float) -> str:
+    return repr(float(value)) if value not in (float("inf"), float("-inf")) else ("+Inf" if value > 0 else "-Inf")
+
+
+class MetricsRegistry:
+    """
+    Реестр метрик воркера с выводом в текстовом формате Prometheus.
+
+    Uvicorn запускает несколько процессов, а /metrics попадает в случайный из них, поэтому
+    каждый воркер периодически сбрасывает свой снимок в METRICS_DIR/<pid>.json, а /metrics
+    суммирует снимки всех воркеров. Gauge устаревших снимков (завершившихся воркеров)
+    не учитываются, counter и histogram — учитываются, чтобы значения не убывали.
+    Снимки прошлых запусков удаляет clear_directory() в мастер-процессе перед стартом воркеров.
+    """
+
+    def __init__(self, directory: Path, flush_interval: float):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list[Callable[[], None]] = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Функция, обновляющая метрики перед каждым снимком (статистика пулов, кэшей и т.п.)."""
+        self._collectors.append(collector)
+
+    def snapshot(self) -> dict:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning("Metrics collector %s failed: %s", getattr(collector, "__name__", collector), e)
+        return {
+            "pid": os.getpid(),
+            "ts": time.time(),
+            "metrics": {name: metric.dump() for name, metric in self._metrics.items()},
+        }
+
+    def flush(self) -> dict:
+        """Записывает снимок воркера в общий каталог (атомарно, через временный файл)."""
+        snapshot = self.snapshot()
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.directory / f"{snapshot['pid']}.json"
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(snapshot), encoding="utf-8")
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Failed to flush metrics snapshot: %s", e)
+        return snapshot
+
+    def clear_directory(self) -> None:
+        """Удаляет снимки прошлых запусков, иначе их counter суммировались бы с новыми бесконечно."""
+        if not self.directory.exists():
+            return
+        for path in [*self.directory.glob("*.json"), *self.directory.glob("*.tmp")]:
+            try:
+                path.unlink()
+            except OSError as e:
+                logger.warning("Failed to remove stale metrics snapshot %s: %s", path, e)
+
+    def _read_snapshots(self, own: dict) -> list[dict]:
+        snapshots = [own]
+        if not self.directory.exists():
+            return snapshots
+        for path in self.directory.glob("*.json"):
+            if path.stem == str(own["pid"]):
+                continue
+            try:
+                snapshots.append(json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def _merge(self, snapshots: list[dict]) -> dict:
+        now = time.time()
+        merged: dict[str, dict] = {}
+        for snapshot in snapshots:
+            stale = now - snapshot.get("ts", 0) > self.flush_interval * 3
+            for name, metric in snapshot.get("metrics", {}).items():
+                if metric["type"] == "gauge" and stale:
+                    continue
+                target = merged.setdefault(name, {**metric, "samples": {}})
+                for labels, value in metric["samples"]:
+                    key = tuple(labels)
+                    if metric["type"] != "histogram":
+                        target["samples"][key] = target["samples"].get(key, 0.0) + value
+                        continue
+                    if len(value["buckets"]) != len(target["buckets"]):
+                        continue
+                    current = target["samples"].setdefault(
+                        key, {"buckets": [0] * len(target["buckets"]), "sum": 0.0, "count": 0}
+                    )
+                    current["buckets"] = [a + b for a, b in zip(current["buckets"], value["buckets"])]
+                    current["sum"] += value["sum"]
+                    current["count"] += value["count"]
+        return merged
+
+    def render(self) -> str:
+        """Метрики всех воркеров в текстовом формате Prometheus (version 0.0.4)."""
+        merged = self._merge(self._read_snapshots(self.flush()))
+
+        lines = []
+        for name, metric in sorted(merged.items()):
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            labelnames = metric["labelnames"]
+            for key, value in sorted(metric["samples"].items()):
+                if metric["type"] != "histogram":
+                    lines.append(f"{name}{_format_labels(labelnames, key)} {_format_float(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric["buckets"], value["buckets"]):
+                    cumulative += count
+                    le = _format_labels(labelnames, key, f'le="{_format_float(bound)}"')
+                    lines.append(f"{name}_bucket{le} {cumulative}")
+                le = _format_labels(labelnames, key, 'le="+Inf"')
+                lines.append(f"{name}_bucket{le} {value['count']}")
+                lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_float(value['sum'])}")
+                lines.append(f"{name}_count{_format_labels(labelnames, key)} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry(
+    directory=Path(settings.METRICS_DIR or Path(tempfile.gettempdir()) / f"{settings.SERVICE_NAME}_metrics"),
+    flush_interval=settings.METRICS_FLUSH_INTERVAL_SECONDS,
+)
+
+# --- HTTP ---
+http_requests_total = metrics.counter(
+    "http_requests_total", "Количество HTTP-запросов", ("method", "route", "status")
+)
+http_request_duration_seconds = metrics.histogram(
+    "http_request_duration_seconds", "Длительность обработки HTTP-запроса", ("method", "route")
+)
+http_requests_in_flight = metrics.gauge("http_requests_in_flight", "HTTP-запросы в обработке")
+
+# --- База данных ---
+db_pool_size = metrics.gauge("db_pool_size", "Размер пула соединений SQLAlchemy")
+db_pool_checked_out = metrics.gauge("db_pool_checked_out", "Соединения, выданные из пула")
+db_pool_overflow = metrics.gauge("db_pool_overflow", "Соединения сверх pool_size (overflow)")
+db_pool_checkout_wait_seconds = metrics.histogram(
+    "db_pool_checkout_wait_seconds", "Время получения готового соединения из пула"
+)
+db_checkouts_per_request = metrics.histogram(
+    "db_checkouts_per_request", "Соединения, взятые из пула за один HTTP-запрос", buckets=(0, 1, 2, 3, 4, 6, 8)
+)
+
+# --- Пароли и токены ---
+password_hash_duration_seconds = metrics.histogram(
+    "password_hash_duration_seconds", "Время выполнения bcrypt (без ожидания в очереди)", ("operation",)
+)
+password_hash_queue_depth = metrics.gauge("password_hash_queue_depth", "Задачи bcrypt, ожидающие свободного воркера")
+jwt_duration_seconds = metrics.histogram(
+    "jwt_duration_seconds", "Время кодирования/декодирования JWT", ("operation",), buckets=FAST_BUCKETS
+)
+password_hash_in_flight = metrics.gauge("password_hash_in_flight", "Задачи bcrypt в работе и в очереди")
+password_hash_rejected_total = metrics.counter(
+    "password_hash_rejected_total", "Задачи bcrypt, отклонённые из-за переполненной очереди (503)"
+)
+password_hash_wait_seconds_total = metrics.counter(
+    "password_hash_wait_seconds_total", "Суммарное ожидание свободного воркера bcrypt"
+)
+auth_login_total = metrics.counter("auth_login_total", "Попытки входа", ("result",))
+auth_refresh_total = metrics.counter("auth_refresh_total", "Обновления токенов", ("kind", "result"))
+refresh_tokens_purged_total = metrics.counter(
+    "refresh_tokens_purged_total", "Истёкшие и отозванные refresh-токены, удалённые фоновой очисткой"
+)
+refresh_sessions_capped_total = metrics.counter(
+    "refresh_sessions_capped_total", "Сессии, отозванные сверх MAX_ACTIVE_SESSIONS_PER_USER"
+)
+token_maintenance_runs_total = metrics.counter(
+    "token_maintenance_runs_total", "Проходы обслуживания refresh-токенов", ("result",)
+)
+
+# --- Кэши и логирование ---
+cache_size = metrics.gauge("cache_size", "Записи в кэше воркера", ("cache",))
+cache_hits_total = metrics.counter("cache_hits_total", "Попадания в кэш", ("cache",))
+cache_misses_total = metrics.counter("cache_misses_total", "Промахи кэша", ("cache",))
+cache_evictions_total = metrics.counter("cache_evictions_total", "Вытеснения из кэша по размеру", ("cache",))
+log_queue_size = metrics.gauge("log_queue_size", "Записи лога, ожидающие фонового обработчика")
+log_records_dropped_total = metrics.counter(
+    "log_records_dropped_total", "Записи лога, отброшенные из-за переполненной очереди"
+)
+
+
+def cache_collector(name: str, cache) -> Callable[[], None]:
+    """Коллектор, публикующий cache.stats() (TTLCache) с меткой cache=name."""
+    def collect() -> None:
+        stats = cache.stats()
+        cache_size.set(stats["size"], cache=name)
+        cache_hits_total.set(stats["hits"], cache=name)
+        cache_misses_total.set(stats["misses"], cache=name)
+        cache_evictions_total.set(stats["evictions"], cache=name)
+    return collect
+
+
+async def metrics_flush_loop() -> None:
+    """Периодически сбрасывает снимок воркера, чтобы /metrics в других воркерах видел его данные."""
+    while True:
+        await asyncio.sleep(metrics.flush_interval)
+        metrics.flush()
+
+
+class MetricsMiddleware:
+    """ASGI middleware: длительность, число и статусы запросов по шаблону маршрута."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            route = scope.get("route")
+            # Шаблон пути, а не фактический URL — иначе метки разрастаются по id
+            route_path = getattr(route, "path", "unmatched")
+            http_request_duration_seconds.observe(
+                time.perf_counter() - started, method=scope["method"], route=route_path
+            )
+            http_requests_total.inc(method=scope["method"], route=route_path, status=str(status_code))
@@ -1,6 +1,26 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 from passlib.exc import UnknownHashError
 
+from src.core.configuration.config import settings
+from src.core.metrics import (
+    metrics,
+    password_hash_duration_seconds,
+    password_hash_in_flight,
+    password_hash_queue_depth,
+    password_hash_rejected_total,
+    password_hash_wait_seconds_total,
+)
+from src.core.timing import timed
+
+logger = logging.getLogger(__name__)
+
 # Единый контекст хеширования паролей для всего сервиса
 pwd_context = CryptContext(
     schemes=[
@@ -23,3 +43,120 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         return pwd_context.verify(plain_password, hashed_password)
     except UnknownHashError:
         return False
+
+
+def _timed_call(func: Callable, *args):
+    """Выполняется внутри пула: возвращает результат и чистое время выполнения."""
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+class PasswordHasher:
+    """
+    Выполняет bcrypt в отдельном пуле потоков или процессов, чтобы не блокировать event loop.
+
+    Очередь ограничена: если задач в работе и в ожидании больше, чем workers + queue_size,
+    запрос отклоняется с 503, а не копится в памяти.
+    """
+
+    def __init__(self, executor_type: str, max_workers: int, queue_size: int):
+        self.executor_type = executor_type
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self._executor: Optional[Executor] = None
+
+        self.in_flight = 0
+        self.rejected = 0
+        self.calls = 0
+        self.exec_seconds_total = 0.0
+        self.wait_seconds_total = 0.0
+        self.exec_seconds_max = 0.0
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self.in_flight - self.max_workers)
+
+    async def run(self, func: Callable, *args):
+        if self.in_flight >= self.max_workers + self.queue_size:
+            self.rejected += 1
+            logger.warning(f"Password hashing queue is full (in_flight={self.in_flight}), request rejected")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Сервис перегружен, повторите попытку позже",
+            )
+
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            with timed("hash"):
+                result, exec_seconds = await loop.run_in_executor(self.executor, _timed_call, func, *args)
+        finally:
+            self.in_flight -= 1
+
+        total_seconds = time.perf_counter() - started
+        self.calls += 1
+        self.exec_seconds_total += exec_seconds
+        self.wait_seconds_total += max(0.0, total_seconds - exec_seconds)
+        self.exec_seconds_max = max(self.exec_seconds_max, exec_seconds)
+        password_hash_duration_seconds.observe(exec_seconds, operation=func.__name__.removesuffix("_password"))
+        logger.debug(
+            f"{func.__name__} took {exec_seconds * 1000:.1f} ms "
+            f"(waited {(total_seconds - exec_seconds) * 1000:.1f} ms, queue depth {self.queue_depth})"
+        )
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "executor": self.executor_type,
+            "workers": self.max_workers,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "rejected": self.rejected,
+            "calls": self.calls,
+            "exec_seconds_total": self.exec_seconds_total,
+            "wait_seconds_total": self.wait_seconds_total,
+            "exec_seconds_max": self.exec_seconds_max,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    executor_type=settings.PASSWORD_HASH_EXECUTOR,
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+)
+
+
+def collect_password_hasher_metrics() -> None:
+    stats = password_hasher.stats()
+    password_hash_queue_depth.set(stats["queue_depth"])
+    password_hash_in_flight.set(stats["in_flight"])
+    password_hash_rejected_total.set(stats["rejected"])
+    password_hash_wait_seconds_total.set(stats["wait_seconds_total"])
+
+
+metrics.add_collector(collect_password_hasher_metrics)
+
+
+async def hash_password_async(plain_password: str) -> str:
+    return await password_hasher.run(hash_password, plain_password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Асинхронная версия verify_password: bcrypt выполняется в пуле password_hasher."""
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
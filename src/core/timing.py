@@ -0,0 +1,102 @@
+# src/core/timing.py
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from src.core.configuration.config import settings
+from src.core.metrics import db_checkouts_per_request
+
+logger = logging.getLogger(__name__)
+
+# Накопленное время по категориям (db / hash / jwt) для текущего запроса
+_request_timings: ContextVar[Optional[defaultdict]] = ContextVar("request_timings", default=None)
+# Активный таймер текущей задачи: (категория, момент начала текущего отрезка)
+_current_timer: ContextVar[Optional[tuple[str, float]]] = ContextVar("current_timer", default=None)
+# Счётчики событий текущего запроса (например, db_checkouts)
+_request_counters: ContextVar[Optional[defaultdict]] = ContextVar("request_counters", default=None)
+
+
+def request_counters() -> Optional[defaultdict]:
+    """
+    Счётчики текущего запроса или None вне запроса.
+    Объект изменяемый: его можно захватить и увеличивать из кода, где ContextVar недоступен.
+    """
+    return _request_counters.get()
+
+
+@contextmanager
+def timed(name: str):
+    """
+    Добавляет время блока к категории name текущего запроса.
+
+    Время исключающее: пока внутри блока работает вложенный таймер (например, bcrypt
+    внутри сессии БД), внешний стоит на паузе. Вне запроса ничего не делает.
+    """
+    timings = _request_timings.get()
+    if timings is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    parent = _current_timer.get()
+    if parent is not None:
+        timings[parent[0]] += started - parent[1]
+    _current_timer.set((name, started))
+    try:
+        yield
+    finally:
+        finished = time.perf_counter()
+        current = _current_timer.get()
+        timings[name] += finished - (current[1] if current and current[0] == name else started)
+        _current_timer.set((parent[0], finished) if parent is not None else None)
+
+
+def _format_server_timing(timings: dict, total: float, counters: dict) -> str:
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in sorted(timings.items())]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    parts.extend(f'{name};desc="{count}"' for name, count in sorted(counters.items()))
+    return ", ".join(parts)
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware: заголовок Server-Timing с разбивкой времени по db/hash/jwt
+    и числом соединений, взятых из пула за запрос (db_checkouts), и запись в лог
+    запросов дольше SLOW_REQUEST_THRESHOLD_SECONDS.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = defaultdict(float)
+        counters = defaultdict(int)
+        _request_timings.set(timings)
+        _request_counters.set(counters)
+        _current_timer.set(None)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and settings.SERVER_TIMING_HEADER_ENABLED:
+                header = _format_server_timing(timings, time.perf_counter() - started, counters)
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            db_checkouts_per_request.observe(counters.get("db_checkouts", 0))
+            if elapsed >= settings.SLOW_REQUEST_THRESHOLD_SECONDS:
+                logger.warning(
+                    "Slow request %s %s: %.1f ms (%s)",
+                    scope["method"], scope["path"], elapsed * 1000,
+                    _format_server_timing(timings, elapsed, counters),
+                )
@@ -3,16 +3,21 @@ import logging
 from typing import Dict, Any, Optional
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-import pandas as pd
-from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.core.configuration.config import settings
+from src.core.log_sampling import SampledLogger
 from src.utils import jwt_utils
-from src.models.user_models import User, Role, RolePermissions, Permission, UserRoles
-from src.session import db_manager
+from src.services.principal_service import get_principal
+from src.session import get_request_session
 
 
 logger = logging.getLogger(__name__)
+# Свой семплер у каждой причины отказа: поток одних отказов не прячет редкие другие
+missing_sub_log = SampledLogger(logger, "access_token.missing_sub")
+invalid_sub_log = SampledLogger(logger, "access_token.invalid_sub")
+user_not_found_log = SampledLogger(logger, "access_token.user_not_found")
+user_inactive_log = SampledLogger(logger, "access_token.user_inactive")
 
 
 # 1. Валидатор JWT-токена (для пользователей)
@@ -20,55 +25,64 @@ class JWTTokenValidator:
     def __init__(self):
         self.security = HTTPBearer()
 
-    async def __call__(self, credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer())) -> Dict[str, Any]:
+    async def __call__(
+        self,
+        credentials: HTTPAuthorizationCredentials = Depends(HTTPBearer()),
+        session: AsyncSession = Depends(get_request_session),
+    ) -> Dict[str, Any]:
+        # session — общая ленивая сессия запроса: при попадании в кэш принципалов соединение не берётся
         token = credentials.credentials
         try:
             payload = jwt_utils.decode_jwt_token(token, expected_type="access")
             
             user_id_str = payload.get("sub")
             if not user_id_str:
-                logger.warning("Missing 'sub' in access token")
+                missing_sub_log.warning("Missing 'sub' in access token")
                 raise HTTPException(status_code=401, detail="Invalid token")
 
-            async with db_manager.get_db_session() as session:
-                try:
-                    user_id = int(user_id_str)
-                except ValueError:
-                    logger.warning(f"Invalid user ID '{user_id_str}' in access token")
-                    raise HTTPException(status_code=401, detail="Invalid token")
+            try:
+                user_id = int(user_id_str)
+            except ValueError:
+                invalid_sub_log.warning("Invalid user ID '%s' in access token", user_id_str)
+                raise HTTPException(status_code=401, detail="Invalid token")
 
-                result = await session.execute(select(User).where(User.id == user_id))
-                user_obj = result.scalar_one_or_none()
+            if settings.STATELESS_ACCESS_TOKENS and payload.get("pv") == settings.ACCESS_TOKEN_CLAIMS_VERSION:
+                # Claims подписаны нами и живут не дольше access-токена — БД не нужна
+                logger.debug("JWT access token validated from claims for user_id=%s", user_id)
+                return payload
 
-                if not user_obj:
-                    logger.warning(f"User with ID {user_id} not found")
-                    raise HTTPException(status_code=401, detail="User not found")
+            principal = await get_principal(user_id, session=session)
 
-                await session.refresh(user_obj, ["roles"])
+            if not principal:
+                user_not_found_log.warning("User with ID %s not found", user_id)
+                raise HTTPException(status_code=401, detail="User not found")
 
-                payload["organization_id"] = user_obj.organization_id
-                payload["roles"] = [role.name for role in user_obj.roles]
+            if not principal["is_active"] or principal["is_blocked"] or principal["is_deleted"]:
+                user_inactive_log.warning("User with ID %s is blocked, deleted or inactive", user_id)
+                raise HTTPException(status_code=401, detail="User is blocked, deleted or inactive")
 
-                permissions_query = (
-                    select(Permission.code)
-                    .join(RolePermissions, Permission.id == RolePermissions.c.permission_id)
-                    .join(Role, Role.id == RolePermissions.c.role_id)
-                    .join(UserRoles, UserRoles.c.role_id == Role.id)
-                    .where(UserRoles.c.user_id == user_id)
-                )
-                permissions_result = await session.execute(permissions_query)
-                payload["permissions"] = [row[0] for row in permissions_result.fetchall()]
+            payload["organization_id"] = principal["organization_id"]
+            payload["roles"] = list(principal["roles"])
+            payload["permissions"] = list(principal["permissions"])
 
-            logger.info(f"JWT access token validated and data fetched for user_id={payload['sub']}")
+            logger.debug("JWT access token validated and data fetched for user_id=%s", user_id)
             return payload
 
         except HTTPException:
             raise
         except Exception as e:
-            logger.error(f"Unexpected error during JWT validation in JWTTokenValidator: {e}", exc_info=True)
+            logger.error("Unexpected error during JWT validation in JWTTokenValidator: %s", e, exc_info=True)
             raise HTTPException(status_code=500, detail="Internal token validation error")
 
 # 2. Статический валидатор
 
 
 jwt_token_validator = JWTTokenValidator()
+
+
+# 3. Доступ только для суперпользователя организации
+async def require_superuser(user_data: dict = Depends(jwt_token_validator)) -> dict:
+    """Возвращает данные access_token, если у пользователя есть роль 'superuser', иначе 403."""
+    if "superuser" not in user_data.get("roles", []):
+        raise HTTPException(status_code=403, detail="Недостаточно прав для выполнения операции")
+    return user_data
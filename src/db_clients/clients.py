@@ -1,14 +1,16 @@
 # src/db_clients/clients.py
-import psycopg2
-from src.db_clients.config import DBConfig
+from src.db_clients.config import db_settings
 
-config = DBConfig()
 
 def get_db_connection():
+    # psycopg2 нужен только синхронным утилитам — веб-воркеры его не загружают
+    import psycopg2
+
+    config = db_settings.db
     return psycopg2.connect(
         dbname=config.DB_NAME,
         user=config.DB_USER,
         password=config.DB_PASSWORD,
         host=config.DB_HOST,
         port=config.DB_PORT,
-    )
\ No newline at end of file
+    )
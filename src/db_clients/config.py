@@ -34,12 +34,58 @@ class DBConfig:
         self.DB_HOST = active["DB_HOST"]
         self.DB_PORT = active["DB_PORT"]
 
+        # Пул соединений (на каждый воркер): всего соединений до WORKERS * (POOL_SIZE + MAX_OVERFLOW)
+        self.DB_POOL_SIZE = env.int("DB_POOL_SIZE", 5)
+        self.DB_MAX_OVERFLOW = env.int("DB_MAX_OVERFLOW", 5)
+        self.DB_POOL_TIMEOUT = env.float("DB_POOL_TIMEOUT", 10.0)
+        self.DB_POOL_RECYCLE = env.int("DB_POOL_RECYCLE", 1800)
+        # Проверка соединения перед каждой выдачей из пула переживает перезапуск Postgres и обрывы
+        # соединений, но стоит round trip на каждый checkout; отключить: DB_POOL_PRE_PING=false
+        self.DB_POOL_PRE_PING = env.bool("DB_POOL_PRE_PING", True)
+        self.DB_CONNECT_TIMEOUT = env.float("DB_CONNECT_TIMEOUT", 160.0)
+        # Кэш скомпилированных SQLAlchemy-запросов и кэш prepared statements asyncpg (на соединение)
+        self.DB_QUERY_CACHE_SIZE = env.int("DB_QUERY_CACHE_SIZE", 500)
+        self.DB_PREPARED_STATEMENT_CACHE_SIZE = env.int("DB_PREPARED_STATEMENT_CACHE_SIZE", 500)
+
+        # Параметры сессии Postgres, передаются asyncpg при установке соединения
+        self.DB_APPLICATION_NAME = env.str("SERVICE_NAME", "db_template")
+        self.DB_JIT = env.bool("DB_JIT", False)
+        self.DB_STATEMENT_TIMEOUT_MS = env.int("DB_STATEMENT_TIMEOUT_MS", 30000)
+
     def url(self):
         return f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
     
     def get_async_url(self):
         return f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
+    def server_settings(self) -> dict:
+        settings = {
+            "application_name": self.DB_APPLICATION_NAME,
+            "jit": "on" if self.DB_JIT else "off",
+        }
+        if self.DB_STATEMENT_TIMEOUT_MS > 0:
+            settings["statement_timeout"] = str(self.DB_STATEMENT_TIMEOUT_MS)
+        return settings
+
+    def get_engine_options(self) -> dict:
+        """Параметры create_async_engine для пула и соединений asyncpg."""
+        return {
+            "pool_size": self.DB_POOL_SIZE,
+            "max_overflow": self.DB_MAX_OVERFLOW,
+            "pool_timeout": self.DB_POOL_TIMEOUT,
+            "pool_recycle": self.DB_POOL_RECYCLE,
+            "pool_pre_ping": self.DB_POOL_PRE_PING,
+            "query_cache_size": self.DB_QUERY_CACHE_SIZE,
+            "connect_args": {
+                "timeout": self.DB_CONNECT_TIMEOUT,
+                "prepared_statement_cache_size": self.DB_PREPARED_STATEMENT_CACHE_SIZE,
+                "server_settings": self.server_settings(),
+            },
+        }
+
+    def max_connections_per_worker(self) -> int:
+        return self.DB_POOL_SIZE + self.DB_MAX_OVERFLOW
+
 
 class TablesConfig:
     def __init__(self):
@@ -53,6 +99,7 @@ class TablesConfig:
         self.PERMISSIONS = "permissions"
         self.ROLE_PERMISSIONS = "role_permissions"
         self.USER_ROLES = "user_roles"
+        self.USER_IDENTIFIERS = "user_identifiers"
 
 
 class RolesConfig:
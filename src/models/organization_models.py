@@ -1,7 +1,7 @@
 
 from datetime import datetime
 
-from sqlalchemy import DateTime, ForeignKey, String, func
+from sqlalchemy import DateTime, ForeignKey, Index, String, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src.db_clients.config import db_settings
@@ -10,6 +10,9 @@ from src.models.base_model import ORMBase
 
 class Organization(ORMBase):
     __tablename__ = db_settings.tables.ORGANIZATIONS
+    __table_args__ = (
+        Index('ix_organizations_email', 'email', unique=True),
+    )
 
     name: Mapped[str] = mapped_column(String)
     email: Mapped[str] = mapped_column(String)
@@ -22,6 +25,7 @@ class Organization(ORMBase):
         'User',
         foreign_keys='Organization.owner_id',
         uselist=False,
+        lazy='raise',
     )
 
     # Явная связь с пользователями по полю User.organization_id
@@ -30,4 +34,5 @@ class Organization(ORMBase):
         back_populates='organization',
         foreign_keys='User.organization_id',
         primaryjoin='Organization.id == User.organization_id',
+        lazy='raise',
     )
\ No newline at end of file
@@ -1,7 +1,7 @@
 # src/models/user_model.py
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Table, Text, func
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, String, Table, Text, func, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src.db_clients.config import db_settings
@@ -25,9 +25,18 @@ RolePermissions = Table(
 )
 
 
+# Все связи по умолчанию lazy='raise': неявная подгрузка — ошибка, а не скрытые запросы.
+# Нужный граф каждый запрос указывает сам (selectinload/joinedload в options).
 class User(ORMBase):
     __tablename__ = db_settings.tables.USERS
-    
+    __table_args__ = (
+        # Keyset-пагинация пользователей организации
+        Index('ix_users_org_created_id', 'organization_id', 'created_at', 'id'),
+        # Уникальность проверяет БД: вставка без предварительных SELECT, ошибка -> 409
+        Index('ix_users_login', 'login', unique=True),
+        Index('ix_users_email', 'email', unique=True),
+    )
+
     organization_id: Mapped[int] = mapped_column(ForeignKey('organizations.id'))
     login: Mapped[str] = mapped_column(String)
     first_name: Mapped[str] = mapped_column(String)
@@ -47,32 +56,66 @@ class User(ORMBase):
     is_blocked: Mapped[bool] = mapped_column(Boolean, default=False)
     is_deleted: Mapped[bool] = mapped_column(Boolean, default=False)
 
-    refresh_tokens: Mapped[list['RefreshToken']] = relationship('RefreshToken', back_populates='user')
+    refresh_tokens: Mapped[list['RefreshToken']] = relationship(
+        'RefreshToken', back_populates='user', lazy='raise'
+    )
     organization: Mapped['Organization'] = relationship(
         'Organization',
         back_populates='users',
         foreign_keys=[organization_id],
         primaryjoin='User.organization_id == Organization.id',
+        lazy='raise',
     )
 
     roles: Mapped[list['Role']] = relationship(
         'Role',
         secondary=UserRoles,
         back_populates='users',
-        lazy='selectin'
+        lazy='raise',
     )
 
 
+class UserIdentifier(ORMBase):
+    """
+    Нормализованные идентификаторы входа пользователя (login, email, nickname).
+    Позволяют найти пользователя по любому из них одним обращением к индексу.
+    Логины и email уникальны без учёта регистра; никнеймы могут совпадать —
+    при поиске login и email имеют приоритет над nickname.
+    """
+    __tablename__ = db_settings.tables.USER_IDENTIFIERS
+    __table_args__ = (
+        Index('ix_user_identifiers_identifier', 'identifier'),
+        # Один логин/email — один пользователь
+        Index(
+            'ix_user_identifiers_login_email', 'identifier',
+            unique=True, postgresql_where=text("kind IN ('login', 'email')"),
+        ),
+        Index('ix_user_identifiers_user_id', 'user_id'),
+    )
+
+    user_id: Mapped[int] = mapped_column(ForeignKey('users.id', ondelete='CASCADE'))
+    kind: Mapped[str] = mapped_column(String(16))
+    identifier: Mapped[str] = mapped_column(String)
+
+
 class RefreshToken(ORMBase):
     __tablename__ = db_settings.tables.REFRESH_TOKENS
-    
+    __table_args__ = (
+        Index('ix_refresh_tokens_jti', 'jti', unique=True),
+        Index('ix_refresh_tokens_user_id', 'user_id'),
+        Index('ix_refresh_tokens_expires_at', 'expires_at'),
+        Index('ix_refresh_tokens_revoked_at', 'revoked_at', postgresql_where=text('revoked')),
+    )
+
     user_id: Mapped[int] = mapped_column(ForeignKey('users.id'))
-    token: Mapped[str] = mapped_column(String)
+    # SHA-256 от refresh-токена (hex), сам токен в БД не хранится
+    token: Mapped[str] = mapped_column(String(64))
     jti: Mapped[str] = mapped_column(String(255))
     expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
     revoked: Mapped[bool] = mapped_column(Boolean, default=False)
+    revoked_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
 
-    user: Mapped['User'] = relationship('User', back_populates='refresh_tokens')
+    user: Mapped['User'] = relationship('User', back_populates='refresh_tokens', lazy='raise')
 
 
 class Role(ORMBase):
@@ -86,13 +129,14 @@ class Role(ORMBase):
         'User',
         secondary=UserRoles,
         back_populates='roles',
+        lazy='raise',
     )
 
     permissions: Mapped[list['Permission']] = relationship(
         'Permission',
         secondary=RolePermissions,
         back_populates='roles',
-        lazy='selectin'
+        lazy='raise',
     )
 
 
@@ -107,6 +151,7 @@ class Permission(ORMBase):
         'Role',
         secondary=RolePermissions,
         back_populates='permissions',
+        lazy='raise',
     )
 
 class Tables:
@@ -117,3 +162,4 @@ class Tables:
         self.RefreshToken = RefreshToken
         self.UserRoles = UserRoles
         self.RolePermissions = RolePermissions
+        self.UserIdentifier = UserIdentifier
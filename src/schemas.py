@@ -16,6 +16,7 @@ class RegistrationRequest(BaseModel):
     superuser_last_name: str
     superuser_email: EmailStr
     superuser_password: str
+    # Оставлены для совместимости: уникальность email теперь всегда обеспечивают индексы БД
     verify_superuser_email: Optional[bool] = False
     verify_organization_email: Optional[bool] = False
 
@@ -39,6 +40,7 @@ class UserResponse(BaseModel):
 
 class GetUsersByOrgResponse(BaseModel):
     users: List[UserResponse]
+    next_cursor: Optional[str] = None
 
 
 class RefreshRequest(BaseModel):
@@ -52,6 +54,12 @@ class RefreshResponse(BaseModel):
     expires_in: int
     refresh_expires_in: int
 
+class AccessRefreshResponse(BaseModel):
+    access_token: str
+    token_type: Literal["Bearer"]
+    expires_in: int
+
+
 class AuthRequest(BaseModel):
     login: str | EmailStr
     password: str
@@ -121,6 +129,30 @@ class UserStatusChangeRequest(BaseModel):
     login_to_change: str
 
 
+class BulkUserStatusChangeRequest(BaseModel):
+    """
+    Схема запроса на массовое изменение статуса пользователей организации.
+    Пользователи задаются логинами и/или id.
+    """
+    logins: List[str] = []
+    user_ids: List[int] = []
+
+
+class BulkUserStatusChangeItem(BaseModel):
+    login: Optional[str] = None
+    user_id: Optional[int] = None
+    success: bool
+    message: str
+
+
+class BulkUserStatusChangeResponse(BaseModel):
+    """
+    Схема ответа на массовое изменение статуса: результат по каждому переданному логину/id.
+    """
+    updated: int
+    results: List[BulkUserStatusChangeItem]
+
+
 class AccessTokenResponse(BaseModel):
     user_id: int
     org_id: int
@@ -1,38 +1,70 @@
 # src/server.py
-import multiprocessing
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 import uvicorn
 from dotenv import load_dotenv
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.security import HTTPBearer 
 
 from src.core.configuration.config import settings
-from src.core.logger import logger
+from src.core.logger import logger, logger_manager
 from src.api.api_routers import api_router
 
 from src.core.exceptions import register_exception_handlers
+from src.core.log_sampling import flush_summaries, log_summary_loop
+from src.core.metrics import MetricsMiddleware, metrics, metrics_flush_loop
+from src.core.timing import TimingMiddleware
+from src.db_clients.config import db_settings
+from src.core.security.password import password_hasher
+from src.services.token_maintenance import token_maintenance_loop
+from src.session import db_manager
 
 API_PREFIX = "/" + settings.SERVICE_NAME
 
 load_dotenv()
 
-logger.info("Starting microservice main forecast")
-
 origins = ["http://localhost", "http://77.37.136.11"] if settings.PUBLIC_OR_LOCAL == "LOCAL" else ["http://77.37.136.11"]
 
 
-workers = multiprocessing.cpu_count()
-logger.info(f"[WORKERS] Count workers = {workers}")
-
 security = HTTPBearer() 
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger_manager.ensure_configured()
+    logger.info("Starting microservice main forecast")
+    db_manager.init()
+
+    maintenance_task = None
+    if settings.TOKEN_MAINTENANCE_ENABLED:
+        maintenance_task = asyncio.create_task(token_maintenance_loop())
+    metrics_task = asyncio.create_task(metrics_flush_loop())
+    log_summary_task = asyncio.create_task(log_summary_loop())
+
+    yield
+
+    for task in (maintenance_task, metrics_task, log_summary_task):
+        if task:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+    metrics.flush()
+    password_hasher.shutdown()
+    await db_manager.dispose()
+    flush_summaries(force=True)
+    logger_manager.stop()
+
+
 docs_url = "/docs"
 app = FastAPI(
     docs_url=docs_url,
     openapi_url="/openapi.json",
-    root_path=API_PREFIX
+    root_path=API_PREFIX,
+    lifespan=lifespan,
 )
 
 @app.exception_handler(RequestValidationError)
@@ -55,6 +87,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TimingMiddleware)
+
 register_exception_handlers(app)
 
 app.include_router(api_router, prefix="/api/v1")
@@ -64,15 +99,30 @@ def read_root():
     logger.info("Root endpoint accessed.")
     return {"message": "Welcome to the Horizon System API"}
 
+
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    """Метрики всех воркеров в текстовом формате Prometheus."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 if __name__ == "__main__":
+    logger_manager.ensure_configured()
     try:
         logger.info(f"Starting server on http://{settings.HOST}:{settings.PORT}")
+        per_worker = db_settings.db.max_connections_per_worker()
+        logger.info(
+            f"[WORKERS] {settings.WORKERS} workers x {per_worker} DB connections "
+            f"(pool_size={db_settings.db.DB_POOL_SIZE}, max_overflow={db_settings.db.DB_MAX_OVERFLOW}) "
+            f"= up to {settings.WORKERS * per_worker} connections to Postgres"
+        )
+        # Мастер-процесс: снимки метрик прошлого запуска не должны суммироваться с новыми
+        metrics.clear_directory()
         print(f'🚀 Документация http://0.0.0.0:{settings.PORT}{API_PREFIX}/docs')
         uvicorn.run(
             "src.server:app",
             host=settings.HOST,
             port=settings.PORT,
-            workers=4,
+            workers=settings.WORKERS,
             # log_level="debug",
         )
     except Exception as e:
@@ -1,88 +1,109 @@
 # src/services/auth_service.py
 from datetime import datetime, timedelta
 from logging import getLogger
+from typing import Optional
 
 from fastapi import HTTPException, status
-from src.core.security.password import verify_password
-from sqlalchemy import or_, select
+from src.core.security.password import verify_password_async
+from sqlalchemy import bindparam, case, select
 from sqlalchemy.orm import selectinload 
 
-from src.models.user_models import RefreshToken, User, Role, Permission 
+from src.models.user_models import RefreshToken, User, Role, Permission, UserIdentifier
+from src.services.login_identifier_service import normalize_login_identifier
 from src.schemas import AuthResponse, UserAuthResponse, LogoutResponse
 from src.session import db_manager
-from src.utils import jwt_utils 
+from src.utils import jwt_utils, token_service
 from src.utils.jwt_utils import revoke_existing_tokens
 from src.core.configuration.config import settings
+from src.core.metrics import auth_login_total
 
 logger = getLogger(__name__)
 
+# Поиск пользователя по логину/email/никнейму вместе с ролями и правами; строится один раз.
+# Логин и email уникальны и идут первыми; никнейм может принадлежать нескольким пользователям.
+LOGIN_QUERY = (
+    select(User, UserIdentifier.kind)
+    .options(selectinload(User.roles).selectinload(Role.permissions))
+    .join(UserIdentifier, UserIdentifier.user_id == User.id)
+    .where(UserIdentifier.identifier == bindparam("identifier"))
+    .order_by(case((UserIdentifier.kind == "nickname", 1), else_=0))
+    .limit(2)
+)
+
+
+def _resolve_login_user(rows) -> Optional[User]:
+    """Пользователь по результату LOGIN_QUERY; общий для нескольких пользователей никнейм входа не даёт."""
+    if not rows:
+        return None
+    user, kind = rows[0]
+    if kind == "nickname" and len(rows) > 1:
+        return None
+    return user
+
+
 async def auth(login: str, password: str) -> AuthResponse:
+    # Проверка пароля — сотни миллисекунд в пуле потоков; соединение на это время возвращается в пул
     async with db_manager.get_db_session() as session:
-        query = (
-            select(User)
-            .options(
-                selectinload(User.roles).selectinload(Role.permissions) 
-            )
-            .where(
-                or_(User.email == login, User.nickname == login, User.login == login)
-            )
+        result = await session.execute(
+            LOGIN_QUERY, {"identifier": normalize_login_identifier(login)}
         )
+        user = _resolve_login_user(result.all())
 
-        result = await session.execute(query)
-        user = result.scalar_one_or_none()
-
-        if not user or not verify_password(password, user.password):
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Неверные учётные данные"
-            )
+    if not user or not await verify_password_async(password, user.password):
+        auth_login_total.inc(result="invalid_credentials")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Неверные учётные данные"
+        )
 
-        if not user.is_active or user.is_blocked or user.is_deleted:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Пользователь заблокирован, удалён или неактивен"
-            )
+    if not user.is_active or user.is_blocked or user.is_deleted:
+        auth_login_total.inc(result="inactive")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Пользователь заблокирован, удалён или неактивен"
+        )
 
-        # Отзываем старые refresh-токены
-        await revoke_existing_tokens(session, user.id)
-        await session.commit()
+    # --- Подготовка данных пользователя ---
+    roles = [role.name for role in user.roles]
+    permissions = [permission.code for role in user.roles for permission in role.permissions]
 
-        # --- Генерируем новые токены ---
-        access_token = await jwt_utils.create_access_token(user_id=user.id)
-        refresh_token, refresh_jti = await jwt_utils.create_refresh_token(user_id=user.id)
+    # --- Генерируем новые токены ---
+    access_token = await jwt_utils.create_access_token(
+        user_id=user.id,
+        principal={"organization_id": user.organization_id, "roles": roles, "permissions": permissions},
+    )
+    refresh_token, refresh_jti = await jwt_utils.create_refresh_token(user_id=user.id)
 
-        db_refresh_token = RefreshToken(
+    async with db_manager.get_db_session() as session:
+        # Отзываем старые refresh-токены и сохраняем новый одной транзакцией
+        await revoke_existing_tokens(session, user.id)
+        session.add(RefreshToken(
             user_id=user.id,
-            token=refresh_token,
+            token=jwt_utils.hash_refresh_token(refresh_token),
             jti=refresh_jti,
             expires_at=datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS), # Используем настройку
-        )
-
-        session.add(db_refresh_token)
+        ))
         await session.commit()
+    auth_login_total.inc(result="success")
 
-        # --- Подготовка данных пользователя ---
-        roles = [role.name for role in user.roles]
-        permissions = [permission.code for role in user.roles for permission in role.permissions]
-
-        return AuthResponse(
-            access_token=access_token,
-            refresh_token=refresh_token,
-            token_type="Bearer",
-            expires_in=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60, 
-            refresh_expires_in=settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60,
-            user=UserAuthResponse(
-                id=user.id,
-                organization_id=user.organization_id,
-                roles=roles,
-                permissions=permissions,
-            ),
-        )
+    return AuthResponse(
+        access_token=access_token,
+        refresh_token=refresh_token,
+        token_type="Bearer",
+        expires_in=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60, 
+        refresh_expires_in=settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60,
+        user=UserAuthResponse(
+            id=user.id,
+            organization_id=user.organization_id,
+            roles=roles,
+            permissions=permissions,
+        ),
+    )
 
 
 async def logout(refresh_token: str) -> LogoutResponse:
     async with db_manager.get_db_session() as session:
-        await jwt_utils.revoke_one_token(session, refresh_token) 
+        await token_service.revoke_one_token(session, refresh_token)
         await session.commit()
         return LogoutResponse( 
             detail='Выход выполнен успешно'
@@ -1,31 +1,117 @@
+import asyncio
 from logging import getLogger
-from sqlalchemy import select, func
+
+from sqlalchemy import func, select, text
 from sqlalchemy.exc import SQLAlchemyError
+
+from src.core.cache import TTLCache
+from src.core.configuration.config import settings
 from src.models.user_models import Tables
 from src.session import db_manager
 
 logger = getLogger(__name__)
 tables = Tables()
 
-async def check_tables_info():
+# Результаты диагностики кэшируются по режиму ('estimate' / 'exact')
+tables_info_cache = TTLCache(maxsize=2, ttl=settings.TABLES_INFO_CACHE_SECONDS)
+
+ESTIMATE_QUERY = text("""
+    SELECT c.relname, c.reltuples, s.n_live_tup
+    FROM pg_class c
+    LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+    WHERE c.relkind IN ('r', 'p')
+      AND pg_table_is_visible(c.oid)
+      AND c.relname = ANY(:names)
+""")
+
+
+def _registered_tables() -> dict:
+    """Имя атрибута в Tables -> объект таблицы."""
+    return {
+        attr_name: table
+        for attr_name, table in tables.__dict__.items()
+        if not attr_name.startswith("__")
+    }
+
+
+def _table_name(table) -> str:
+    return getattr(table, "__table__", table).name
+
+
+async def _estimate_tables_info() -> dict:
+    """Оценки числа строк из статистики Postgres одним запросом, без сканирования таблиц."""
+    registered = _registered_tables()
     result = {}
+    try:
+        async with db_manager.get_db_session() as session:
+            rows = await session.execute(
+                ESTIMATE_QUERY, {"names": [_table_name(table) for table in registered.values()]}
+            )
+            stats = {row.relname: row for row in rows}
+    except SQLAlchemyError as e:
+        logger.error(f"Ошибка при чтении статистики таблиц: {e}")
+        return {attr_name: f"Error accessing table: {e}" for attr_name in registered}
+
+    for attr_name, table in registered.items():
+        row = stats.get(_table_name(table))
+        if row is None:
+            result[attr_name] = "Error accessing table: relation does not exist"
+            continue
+        # reltuples = -1, если таблица ещё ни разу не анализировалась
+        estimate = row.n_live_tup if row.n_live_tup is not None else max(int(row.reltuples), 0)
+        result[attr_name] = f"Connection OK, rows (estimate): {estimate}"
+
+    return result
+
+
+async def _count_table_exact(attr_name: str, table, semaphore: asyncio.Semaphore) -> str:
+    timeout = settings.TABLES_INFO_EXACT_TIMEOUT_SECONDS
+    async with semaphore:
+        try:
+            async with db_manager.get_db_session() as session:
+                # Ограничиваем запрос и на стороне сервера, чтобы не оставлять висящий count(*)
+                await session.execute(text(f"SET LOCAL statement_timeout = {int(timeout * 1000)}"))
+                res = await asyncio.wait_for(
+                    session.execute(select(func.count()).select_from(table)),
+                    timeout=timeout,
+                )
+                return f"Connection OK, rows: {res.scalar_one()}"
+
+        except asyncio.TimeoutError:
+            logger.warning(f"Подсчёт строк таблицы {attr_name} превысил {timeout}s")
+            return f"Timeout after {timeout}s"
+
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при доступе к таблице {attr_name}: {e}")
+            return f"Error accessing table: {e}"
+
+        except Exception as e:
+            logger.error(f"Внутренняя ошибка при таблице {attr_name}: {e}")
+            return f"Internal error: {e}"
+
+
+async def _exact_tables_info() -> dict:
+    """Точный count(*) по всем таблицам параллельно, с таймаутом на каждую."""
+    registered = _registered_tables()
+    semaphore = asyncio.Semaphore(settings.TABLES_INFO_EXACT_CONCURRENCY)
+    counts = await asyncio.gather(
+        *(_count_table_exact(attr_name, table, semaphore) for attr_name, table in registered.items())
+    )
+    return dict(zip(registered, counts))
 
-    async with db_manager.get_db_session() as session:
-        for attr_name, table in tables.__dict__.items():
-            if attr_name.startswith("__"):
-                continue
-            try:
-                query = select(func.count()).select_from(table)
-                res = await session.execute(query)
-                count = res.scalar_one()
-                result[attr_name] = f"Connection OK, rows: {count}"
 
-            except SQLAlchemyError as e:
-                logger.error(f"Ошибка при доступе к таблице {attr_name}: {e}")
-                result[attr_name] = f"Error accessing table: {e}"
+async def check_tables_info(mode: str = "estimate") -> dict:
+    """
+    Диагностика таблиц из Tables.
 
-            except Exception as e:
-                logger.error(f"Внутренняя ошибка при таблице {attr_name}: {e}")
-                result[attr_name] = f"Internal error: {e}"
+    Args:
+        mode: 'estimate' — оценки из pg_class/pg_stat_user_tables (по умолчанию),
+              'exact' — точный count(*) по каждой таблице.
+    """
+    cached = tables_info_cache.get(mode)
+    if cached is not None:
+        return cached
 
+    result = await (_exact_tables_info() if mode == "exact" else _estimate_tables_info())
+    tables_info_cache.set(mode, result)
     return result
@@ -3,43 +3,35 @@
 from logging import getLogger
 from fastapi import HTTPException, status
 from sqlalchemy import select, update, insert
+from sqlalchemy.exc import IntegrityError
 
-from src.utils.jwt_utils import create_access_token, create_refresh_token
+from src.utils.jwt_utils import create_access_token, create_refresh_token, hash_refresh_token
 from src.models.user_models import RefreshToken
 from datetime import datetime, timedelta
 from src.session import db_manager
 from src.models.user_models import Organization, User, Role, UserRoles
 from src.schemas import RegistrationRequest
 from src.db_clients.config import RolesConfig
-from src.core.security.password import hash_password
+from src.core.security.password import hash_password_async
+from src.services.login_identifier_service import build_user_identifiers, normalize_login_identifier
+from src.utils.db_errors import conflict_from_integrity_error
 
 logger = getLogger(__name__)
 roles = RolesConfig()
 
 
-async def check_login_exists(session, login: str):
-    result = await session.execute(select(User).where(User.login == login))
-    if result.scalars().first():
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail=f"Суперюзер с логином {login} уже существует"
-        )
+def _registration_conflict_messages(payload: RegistrationRequest) -> dict:
+    """Сообщения 409 для нарушений уникальности при регистрации организации и суперюзера."""
+    login_message = f"Суперюзер с логином {payload.superuser_login} уже существует"
+    email_message = f"Суперюзер с email {payload.superuser_email} уже существует"
+    return {
+        "ix_organizations_email": f"Организация с email {payload.organization_email} уже существует",
+        "ix_users_login": login_message,
+        "ix_users_email": email_message,
+        ("ix_user_identifiers_login_email", normalize_login_identifier(payload.superuser_login)): login_message,
+        ("ix_user_identifiers_login_email", normalize_login_identifier(payload.superuser_email)): email_message,
+    }
 
-async def check_org_exists(session, email: str):
-    result = await session.execute(select(Organization).where(Organization.email == email))
-    if result.scalars().first():
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail=f"Организация с email {email} уже существует"
-        )
-
-async def check_user_email_exists(session, email: str):
-    result = await session.execute(select(User).where(User.email == email))
-    if result.scalars().first():
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail=f"Суперюзер с email {email} уже существует"
-        )
 
 async def create_organization(session, name: str, email: str) -> Organization:
     org = Organization(name=name, email=email, owner_id=None)
@@ -47,8 +39,7 @@ async def create_organization(session, name: str, email: str) -> Organization:
     await session.flush()
     return org
 
-async def create_superuser(session, org_id: int, payload: RegistrationRequest) -> User:
-    hashed_pwd = hash_password(payload.superuser_password)
+async def create_superuser(session, org_id: int, payload: RegistrationRequest, hashed_pwd: str) -> User:
     user = User(
         organization_id=org_id,
         login=payload.superuser_login,
@@ -59,6 +50,8 @@ async def create_superuser(session, org_id: int, payload: RegistrationRequest) -
     )
     session.add(user)
     await session.flush()
+    session.add_all(build_user_identifiers(user))
+    await session.flush()
     return user
 
 async def assign_owner(session, org_id: int, superuser_id: int):
@@ -67,31 +60,31 @@ async def assign_owner(session, org_id: int, superuser_id: int):
     )
 
 async def assign_superuser_role(session, superuser_id: int):
-    role_result = await session.execute(
-        select(Role).where(Role.name == roles.SUPERUSER)
-    )
-    role_obj = role_result.scalars().first()
-    if not role_obj:
+    role_id = (await session.execute(select(Role.id).where(Role.name == roles.SUPERUSER))).scalar()
+    if role_id is None:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Роль SUPERUSER не найдена"
         )
 
     await session.execute(
-        insert(UserRoles).values(user_id=superuser_id, role_id=role_obj.id)
+        insert(UserRoles).values(user_id=superuser_id, role_id=role_id)
     )
 
 async def create_org_and_superuser(payload: RegistrationRequest) -> dict:
     try:
+        # Хэш считается до открытия сессии: на время хэширования соединение не занято
+        hashed_pwd = await hash_password_async(payload.superuser_password)
         async with db_manager.get_db_session() as session:
-            await check_login_exists(session, payload.superuser_login)
-            if payload.verify_organization_email:
-                await check_org_exists(session, payload.organization_email)
-            if payload.verify_superuser_email:
-                await check_user_email_exists(session, payload.superuser_email)
-
-            org = await create_organization(session, payload.organization_name, payload.organization_email)
-            superuser = await create_superuser(session, org.id, payload)
+            # Уникальность логина и email проверяют индексы БД — без предварительных SELECT
+            try:
+                org = await create_organization(session, payload.organization_name, payload.organization_email)
+                superuser = await create_superuser(session, org.id, payload, hashed_pwd)
+            except IntegrityError as e:
+                conflict = conflict_from_integrity_error(e, _registration_conflict_messages(payload))
+                if conflict is None:
+                    raise
+                raise conflict from e
             await assign_owner(session, org.id, superuser.id)
             await assign_superuser_role(session, superuser.id)
 
@@ -101,7 +94,7 @@ async def create_org_and_superuser(payload: RegistrationRequest) -> dict:
 
             db_refresh_token = RefreshToken(
                 user_id=superuser.id,
-                token=refresh_token,
+                token=hash_refresh_token(refresh_token),
                 jti=refresh_jti,
                 expires_at=datetime.utcnow() + timedelta(days=30)
             )
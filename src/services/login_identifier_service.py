@@ -0,0 +1,73 @@
+# src/services/login_identifier_service.py
+from src.db_clients.config import db_settings
+from src.models.user_models import User, UserIdentifier
+
+
+def normalize_login_identifier(value: str) -> str:
+    """Приводит login/email/nickname к ключу поиска: без пробелов по краям и в нижнем регистре."""
+    return value.strip().lower()
+
+
+def build_user_identifiers(user: User) -> list[UserIdentifier]:
+    """
+    Формирует записи идентификаторов входа для пользователя (user.id должен быть известен).
+    Совпадающие значения одного пользователя сводятся к виду с наивысшим приоритетом: login > email > nickname.
+    """
+    identifiers = {}
+    for kind, value in (("login", user.login), ("email", user.email), ("nickname", user.nickname)):
+        if not value:
+            continue
+        identifiers.setdefault(normalize_login_identifier(value), kind)
+
+    return [
+        UserIdentifier(user_id=user.id, kind=kind, identifier=identifier)
+        for identifier, kind in identifiers.items()
+    ]
+
+
+# Кандидаты в идентификаторы входа для существующих пользователей с приоритетом вида:
+# login > email > nickname. Для каждого идентификатора остаётся вид с наивысшим приоритетом;
+# holders — сколько разных пользователей претендуют на него на этом уровне.
+_IDENTIFIER_CANDIDATES = f"""
+    WITH candidates AS (
+        SELECT DISTINCT ON (src.user_id, src.identifier) src.user_id, src.kind, src.identifier, src.priority
+        FROM (
+            SELECT id AS user_id, 'login' AS kind, lower(btrim(login)) AS identifier, 0 AS priority
+            FROM {db_settings.tables.USERS}
+            UNION ALL
+            SELECT id, 'email', lower(btrim(email)), 1 FROM {db_settings.tables.USERS} WHERE email IS NOT NULL
+            UNION ALL
+            SELECT id, 'nickname', lower(btrim(nickname)), 2 FROM {db_settings.tables.USERS} WHERE nickname IS NOT NULL
+        ) AS src
+        ORDER BY src.user_id, src.identifier, src.priority
+    ),
+    ranked AS (
+        SELECT candidates.*,
+               rank() OVER (PARTITION BY identifier ORDER BY priority) AS place,
+               count(*) OVER (PARTITION BY identifier, priority) AS holders
+        FROM candidates
+    )
+"""
+
+# Заполнение user_identifiers для уже существующих пользователей (шаг миграции, повторный запуск безопасен).
+# Неоднозначные идентификаторы (например, логины, различающиеся только регистром) не заносятся:
+# вход по ним невозможно отнести к одному пользователю, их перечисляет AMBIGUOUS_USER_IDENTIFIERS.
+BACKFILL_USER_IDENTIFIERS = f"""
+    {_IDENTIFIER_CANDIDATES}
+    INSERT INTO {db_settings.tables.USER_IDENTIFIERS} (user_id, kind, identifier)
+    SELECT ranked.user_id, ranked.kind, ranked.identifier
+    FROM ranked
+    WHERE ranked.place = 1 AND ranked.holders = 1
+      AND NOT EXISTS (
+          SELECT 1 FROM {db_settings.tables.USER_IDENTIFIERS} ui WHERE ui.identifier = ranked.identifier
+      )
+"""
+
+AMBIGUOUS_USER_IDENTIFIERS = f"""
+    {_IDENTIFIER_CANDIDATES}
+    SELECT DISTINCT identifier, kind, holders
+    FROM ranked
+    WHERE place = 1 AND holders > 1
+    ORDER BY holders DESC, identifier
+    LIMIT 20
+"""
@@ -3,18 +3,28 @@ from fastapi import HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.exc import DatabaseError, SQLAlchemyError
 
+from src.core.cache import SnapshotCache
+from src.core.configuration.config import settings
 from src.models.user_models import Permission
 from src.session import db_manager
 
 logger = getLogger(__name__)
 
+
+async def _load_permissions() -> dict:
+    async with db_manager.get_db_session() as session:
+        query = select(Permission.code).order_by(Permission.id)
+        result = await session.execute(query)
+        return {"permissions": list(result.scalars().all())}
+
+
+# Справочник прав почти не меняется — держим его в памяти воркера
+permissions_snapshot = SnapshotCache("permissions", _load_permissions, settings.REFERENCE_CACHE_REFRESH_SECONDS)
+
+
 async def fetch_permissions_mapping():
     try:
-        async with db_manager.get_db_session() as session:
-            query = select(Permission.code)
-            result = await session.execute(query)
-            rows = result.scalars().all()
-            return {"permissions": rows}
+        return await permissions_snapshot.get()
 
     except DatabaseError:
         raise HTTPException(
@@ -0,0 +1,95 @@
+# src/services/principal_service.py
+import logging
+from typing import Optional
+
+from sqlalchemy import bindparam, select
+
+from src.core.cache import TTLCache
+from src.core.configuration.config import settings
+from src.core.metrics import cache_collector, metrics
+from src.models.user_models import Permission, Role, RolePermissions, User, UserRoles
+from src.session import db_manager
+
+logger = logging.getLogger(__name__)
+
+# Кэш принципалов пользователей в рамках воркера: user_id -> dict
+principal_cache = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_MAXSIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+metrics.add_collector(cache_collector("principal", principal_cache))
+
+# Запрос строится один раз: на каждом вызове меняется только параметр user_id
+PRINCIPAL_QUERY = (
+    select(
+        User.organization_id,
+        User.is_active,
+        User.is_blocked,
+        User.is_deleted,
+        Role.name,
+        Permission.code,
+    )
+    .outerjoin(UserRoles, UserRoles.c.user_id == User.id)
+    .outerjoin(Role, Role.id == UserRoles.c.role_id)
+    .outerjoin(RolePermissions, RolePermissions.c.role_id == Role.id)
+    .outerjoin(Permission, Permission.id == RolePermissions.c.permission_id)
+    .where(User.id == bindparam("user_id"))
+)
+
+
+async def fetch_principal(session, user_id: int) -> Optional[dict]:
+    """
+    Загружает из БД данные, необходимые для авторизации пользователя, одним запросом.
+
+    Returns:
+        dict с ключами organization_id, roles, permissions, is_active, is_blocked, is_deleted
+        или None, если пользователь не найден.
+    """
+    rows = (await session.execute(PRINCIPAL_QUERY, {"user_id": user_id})).all()
+    if not rows:
+        return None
+
+    first = rows[0]
+    roles = dict.fromkeys(row.name for row in rows if row.name is not None)
+    permissions = dict.fromkeys(row.code for row in rows if row.code is not None)
+
+    return {
+        "organization_id": first.organization_id,
+        "roles": tuple(roles),
+        "permissions": tuple(permissions),
+        "is_active": first.is_active,
+        "is_blocked": first.is_blocked,
+        "is_deleted": first.is_deleted,
+    }
+
+
+async def get_principal(user_id: int, session=None) -> Optional[dict]:
+    """
+    Возвращает принципал пользователя из кэша воркера, при промахе — из БД.
+    Если передана session, промах обслуживается в ней без отдельного подключения.
+    """
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    version = principal_cache.version
+    async with db_manager.use_session(session) as session:
+        principal = await fetch_principal(session, user_id)
+
+    if principal is not None:
+        principal_cache.set(user_id, principal, version=version)
+    return principal
+
+
+def invalidate_principal(user_id: int) -> None:
+    """
+    Сбрасывает закэшированный принципал после изменения пользователя.
+    Действует только в текущем воркере: в остальных запись живёт до PRINCIPAL_CACHE_TTL_SECONDS.
+    """
+    principal_cache.invalidate(user_id)
+    logger.debug(f"Principal cache invalidated for user_id={user_id}")
+
+
+def invalidate_principals(user_ids) -> None:
+    """Сбрасывает закэшированные принципалы нескольких пользователей (только в текущем воркере)."""
+    principal_cache.invalidate_many(user_ids)
@@ -4,18 +4,29 @@ from fastapi import HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.exc import DatabaseError, SQLAlchemyError
 
+from src.core.cache import SnapshotCache
+from src.core.configuration.config import settings
 from src.models.user_models import Role
 from src.session import db_manager
 
 logger = logging.getLogger(__name__)
 
+
+async def _load_roles() -> dict:
+    async with db_manager.get_db_session() as session:
+        query = select(Role.name).order_by(Role.id)
+        result = await session.execute(query)
+        return {'roles': list(result.scalars().all())}
+
+
+# Справочник ролей почти не меняется — держим его в памяти воркера
+roles_snapshot = SnapshotCache("roles", _load_roles, settings.REFERENCE_CACHE_REFRESH_SECONDS)
+
+
 async def get_all_roles():
     try:
-        async with db_manager.get_db_session() as session:
-            query = select(Role.name)
-            result = await session.execute(query)
-            return {'roles': result.scalars().all()}
-        
+        return await roles_snapshot.get()
+
     except DatabaseError:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
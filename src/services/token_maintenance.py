@@ -0,0 +1,152 @@
+# src/services/token_maintenance.py
+import asyncio
+import logging
+import time
+from datetime import timedelta
+
+from sqlalchemy import and_, delete, func, or_, select, update
+
+from src.core.configuration.config import settings
+from src.core.metrics import (
+    metrics,
+    refresh_sessions_capped_total,
+    refresh_tokens_purged_total,
+    token_maintenance_runs_total,
+)
+from src.models.user_models import RefreshToken
+from src.session import db_manager
+
+logger = logging.getLogger(__name__)
+
+# Ключ advisory lock: очистку одновременно выполняет только один воркер
+TOKEN_MAINTENANCE_LOCK_KEY = 7_300_001
+
+maintenance_stats = {
+    "runs": 0,
+    "skipped_locked": 0,
+    "rows_purged_total": 0,
+    "sessions_capped_total": 0,
+    "last_rows_purged": 0,
+    "last_sessions_capped": 0,
+    "last_duration_seconds": 0.0,
+}
+
+
+def collect_maintenance_metrics() -> None:
+    token_maintenance_runs_total.set(maintenance_stats["runs"], result="completed")
+    token_maintenance_runs_total.set(maintenance_stats["skipped_locked"], result="skipped_locked")
+    refresh_tokens_purged_total.set(maintenance_stats["rows_purged_total"])
+    refresh_sessions_capped_total.set(maintenance_stats["sessions_capped_total"])
+
+
+metrics.add_collector(collect_maintenance_metrics)
+
+
+async def _purge_batches(conn, condition) -> int:
+    """Удаляет строки по условию пачками по TOKEN_PURGE_BATCH_SIZE; каждая пачка — отдельная транзакция."""
+    batch = select(RefreshToken.id).where(condition).limit(settings.TOKEN_PURGE_BATCH_SIZE)
+
+    purged = 0
+    while True:
+        result = await conn.execute(delete(RefreshToken).where(RefreshToken.id.in_(batch)))
+        await conn.commit()
+        purged += result.rowcount
+
+        if result.rowcount < settings.TOKEN_PURGE_BATCH_SIZE:
+            return purged
+        await asyncio.sleep(settings.TOKEN_PURGE_BATCH_PAUSE_SECONDS)
+
+
+async def purge_refresh_tokens(conn) -> int:
+    """
+    Удаляет истёкшие и давно отозванные refresh токены; между пачками пауза, чтобы не мешать основному трафику.
+    Условия разнесены по проходам, чтобы каждый шёл по своему индексу, а не сканировал таблицу:
+    истёкшие — ix_refresh_tokens_expires_at, отозванные — частичный ix_refresh_tokens_revoked_at.
+    """
+    retention = timedelta(hours=settings.REVOKED_TOKEN_RETENTION_HOURS)
+    purged = await _purge_batches(conn, RefreshToken.expires_at < func.now())
+    purged += await _purge_batches(
+        conn,
+        and_(
+            RefreshToken.revoked == True,
+            or_(RefreshToken.revoked_at.is_(None), RefreshToken.revoked_at < func.now() - retention),
+        ),
+    )
+    return purged
+
+
+async def cap_user_sessions(conn) -> int:
+    """Отзывает самые старые действующие refresh токены сверх MAX_ACTIVE_SESSIONS_PER_USER."""
+    if settings.MAX_ACTIVE_SESSIONS_PER_USER <= 0:
+        return 0
+
+    ranked = (
+        select(
+            RefreshToken.id,
+            func.row_number()
+            .over(partition_by=RefreshToken.user_id, order_by=RefreshToken.id.desc())
+            .label("rn"),
+        )
+        .where(RefreshToken.revoked == False, RefreshToken.expires_at > func.now())
+        .subquery()
+    )
+    result = await conn.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id.in_(select(ranked.c.id).where(ranked.c.rn > settings.MAX_ACTIVE_SESSIONS_PER_USER)))
+        .values(revoked=True, revoked_at=func.now())
+    )
+    await conn.commit()
+    return result.rowcount
+
+
+async def run_token_maintenance() -> dict | None:
+    """
+    Один проход обслуживания refresh_tokens под advisory lock.
+    Возвращает статистику прохода или None, если очистку уже выполняет другой воркер.
+    """
+    async with db_manager.engine.connect() as conn:
+        locked = (await conn.execute(select(func.pg_try_advisory_lock(TOKEN_MAINTENANCE_LOCK_KEY)))).scalar()
+        await conn.commit()
+        if not locked:
+            maintenance_stats["skipped_locked"] += 1
+            logger.debug("Token maintenance is running in another worker, skipping")
+            return None
+
+        started = time.perf_counter()
+        try:
+            purged = await purge_refresh_tokens(conn)
+            capped = await cap_user_sessions(conn)
+        finally:
+            try:
+                await conn.execute(select(func.pg_advisory_unlock(TOKEN_MAINTENANCE_LOCK_KEY)))
+                await conn.commit()
+            except Exception:
+                # Блокировка уровня сессии не должна вернуться в пул вместе с соединением
+                await conn.invalidate()
+                raise
+
+    duration = time.perf_counter() - started
+    maintenance_stats["runs"] += 1
+    maintenance_stats["rows_purged_total"] += purged
+    maintenance_stats["sessions_capped_total"] += capped
+    maintenance_stats["last_rows_purged"] = purged
+    maintenance_stats["last_sessions_capped"] = capped
+    maintenance_stats["last_duration_seconds"] = duration
+
+    logger.info(
+        f"Token maintenance finished: purged {purged} refresh tokens, "
+        f"capped {capped} sessions in {duration:.2f}s"
+    )
+    return {"rows_purged": purged, "sessions_capped": capped, "duration_seconds": duration}
+
+
+async def token_maintenance_loop() -> None:
+    """Периодически запускает обслуживание refresh_tokens, пока задача не будет отменена."""
+    while True:
+        try:
+            await run_token_maintenance()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Token maintenance failed: {e}", exc_info=True)
+        await asyncio.sleep(settings.TOKEN_MAINTENANCE_INTERVAL_SECONDS)
@@ -1,26 +1,30 @@
 # src/services/token_refresh_service.py
 import logging
-from typing import Tuple
+from typing import Optional, Tuple
 
 from src.utils import jwt_utils, token_service
 from src.core.configuration.config import settings
-from datetime import datetime
+from src.core.log_sampling import SampledLogger
+from src.core.metrics import auth_refresh_total
 
-from src.session import db_manager
-from src.models.user_models import User, Role
-from sqlalchemy import select
+from src.services.principal_service import get_principal
 from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
 logger = logging.getLogger(__name__)
+malformed_refresh_log = SampledLogger(logger, "access_refresh.malformed")
 
 # --- Метод для полной ротации  ---
-async def refresh_tokens_logic(refresh_token_str: str) -> Tuple[str, str, int, int]:
+async def refresh_tokens_logic(
+    refresh_token_str: str, session: Optional[AsyncSession] = None
+) -> Tuple[str, str, int, int]:
     """
     Сервисная логика для обновления пары access/refresh токенов (полная ротация).
     Отзывает старый refresh токен и выдает новую пару.
     
     Args:
         refresh_token_str: Строка refresh токена JWT.
+        session: Сессия запроса; отзыв старого и сохранение нового токена выполняются в ней.
         
     Returns:
         Кортеж (new_access_token, new_refresh_token, expires_in, refresh_expires_in)
@@ -29,21 +33,28 @@ async def refresh_tokens_logic(refresh_token_str: str) -> Tuple[str, str, int, i
         HTTPException: При проблемах с токеном (401) или БД (500).
     """
     try:
-        new_access_token, new_refresh_token = await token_service.rotate_refresh_token(refresh_token_str)
+        new_access_token, new_refresh_token = await token_service.rotate_refresh_token(refresh_token_str, session=session)
 
         expires_in = settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
         refresh_expires_in = settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
         
-        logger.info("Tokens successfully refreshed (full rotation) in service layer")
+        auth_refresh_total.inc(kind="full", result="success")
+        logger.debug("Tokens successfully refreshed (full rotation) in service layer")
         return new_access_token, new_refresh_token, expires_in, refresh_expires_in
 
+    except HTTPException:
+        auth_refresh_total.inc(kind="full", result="rejected")
+        raise
     except Exception as e:
-        logger.error(f"Error in full token refresh service logic: {e}", exc_info=True)
+        auth_refresh_total.inc(kind="full", result="error")
+        logger.error("Error in full token refresh service logic: %s", e, exc_info=True)
         raise 
 
 
 # --- Метод для обновления только access токена ---
-async def rotate_access_token_only_logic(refresh_token_str: str) -> Tuple[str, int]:
+async def rotate_access_token_only_logic(
+    refresh_token_str: str, session: Optional[AsyncSession] = None
+) -> Tuple[str, int]:
     """
     Сервисная логика для обновления ТОЛЬКО access токена.
     Проверяет валидность refresh токена, но НЕ отзывает его и НЕ создает новый refresh токен.
@@ -51,6 +62,7 @@ async def rotate_access_token_only_logic(refresh_token_str: str) -> Tuple[str, i
     
     Args:
         refresh_token_str: Строка действующего refresh токена JWT.
+        session: Сессия запроса; проверка токена и промах кэша принципалов обслуживаются в ней.
         
     Returns:
         Кортеж (new_access_token, expires_in)
@@ -65,52 +77,40 @@ async def rotate_access_token_only_logic(refresh_token_str: str) -> Tuple[str, i
         user_id_str = payload.get("sub")
         jti = payload.get("jti") 
 
-        if not user_id_str:
-            logger.warning("Missing 'sub' in refresh token for access-only rotation")
+        if not user_id_str or not jti:
+            malformed_refresh_log.warning("Missing 'sub' or 'jti' in refresh token for access-only rotation")
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
 
         try:
             user_id = int(user_id_str)
         except (ValueError, TypeError):
-            logger.warning(f"Invalid user_id '{user_id_str}' in refresh token")
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
-
-        # 2. Проверяем refresh токен в БД
-        db_token = await token_service.get_refresh_token_from_db(jti, user_id)
-        if not db_token:
-            logger.warning(f"Refresh token with jti={jti} not found in DB for access-only rotation")
+            malformed_refresh_log.warning("Invalid user_id '%s' in refresh token", user_id_str)
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
 
-        if db_token.revoked:
-            logger.warning(f"Refresh token with jti={jti} is revoked for access-only rotation")
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token revoked")
-
-        if db_token.expires_at < datetime.utcnow(): 
-            logger.warning(f"Refresh token with jti={jti} is expired for access-only rotation")
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token expired")
-
+        # 2. Одно чтение: токен не отозван, не истёк, пользователь активен
+        await token_service.check_refresh_token_for_access(jti, user_id, session=session)
 
-        # 3. Получаем информацию о пользователе для создания access токена
-        async with db_manager.get_db_session() as session:
-            user_result = await session.execute(select(User).where(User.id == user_id))
-            user_obj = user_result.scalar_one_or_none()
-            if not user_obj:
-                logger.error(f"User with id={user_id} not found during access-only token rotation")
+        # 3. Роли и права нужны только для stateless токена (из кэша принципалов)
+        principal = None
+        if settings.STATELESS_ACCESS_TOKENS:
+            principal = await get_principal(user_id, session=session)
+            if not principal:
+                logger.error("User with id=%s not found during access-only token rotation", user_id)
                 raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="User data error")
 
-            await session.refresh(user_obj, ["roles"])
-            roles_names = [role.name for role in user_obj.roles]
+        # 4. Создаем новый access токен
+        new_access_token = await jwt_utils.create_access_token(user_id=user_id, principal=principal)
 
-            # 4. Создаем новый access токен
-            new_access_token = await jwt_utils.create_access_token(user_id=user_id)
-            
         expires_in = settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
         
-        logger.info(f"Access token successfully rotated (access-only) for user_id={user_id}")
+        auth_refresh_total.inc(kind="access", result="success")
+        logger.debug("Access token successfully rotated (access-only) for user_id=%s", user_id)
         return new_access_token, expires_in
 
     except HTTPException:
+        auth_refresh_total.inc(kind="access", result="rejected")
         raise
     except Exception as e:
-        logger.error(f"Error in access-only token rotation service logic: {e}", exc_info=True)
+        auth_refresh_total.inc(kind="access", result="error")
+        logger.error("Error in access-only token rotation service logic: %s", e, exc_info=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
\ No newline at end of file
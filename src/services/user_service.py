@@ -1,21 +1,45 @@
 # src/services/user_service.py
 import logging
+from typing import Optional
+
 from fastapi import HTTPException, status
-from sqlalchemy import select, insert
+from sqlalchemy import String, Integer, and_, any_, bindparam, distinct, exists, func, insert, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.core.security.password import hash_password
-from src.models.user_models import User, Role, UserRoles
+from src.core.configuration.config import settings
+from src.core.security.password import hash_password_async
+from src.models.user_models import User, Role, UserRoles, Permission, RolePermissions, RefreshToken
 from src.schemas import (
     RegisterUserRequest, RegisterUserResponse, UserStatusChangeRequest,
-    UserStatusChangeResponse, UserResponse, GetUsersByOrgResponse
+    UserStatusChangeResponse, UserResponse, GetUsersByOrgResponse,
+    BulkUserStatusChangeRequest, BulkUserStatusChangeResponse, BulkUserStatusChangeItem
 )
+from src.services.login_identifier_service import build_user_identifiers, normalize_login_identifier
+from src.services.principal_service import invalidate_principal, invalidate_principals
 from src.session import db_manager
+from src.utils.db_errors import conflict_from_integrity_error
+from src.utils.pagination import decode_cursor, encode_cursor
 
 logger = logging.getLogger(__name__)
 
+def _user_conflict_messages(login: str, email: str) -> dict:
+    """Сообщения 409 для нарушений уникальности при создании пользователя."""
+    login_message = f"Пользователь с логином '{login}' уже существует"
+    email_message = f"Пользователь с email '{email}' уже существует"
+    return {
+        "ix_users_login": login_message,
+        "ix_users_email": email_message,
+        ("ix_user_identifiers_login_email", normalize_login_identifier(login)): login_message,
+        ("ix_user_identifiers_login_email", normalize_login_identifier(email)): email_message,
+    }
+
+
 async def create_user_in_organization(
     current_user_org_id: int, 
-    payload: RegisterUserRequest
+    payload: RegisterUserRequest,
+    session: Optional[AsyncSession] = None,
 ) -> RegisterUserResponse:
     """
     Сервисная функция для создания нового пользователя в указанной организации.
@@ -23,6 +47,7 @@ async def create_user_in_organization(
     Args:
         current_user_org_id: ID организации, в которой создается пользователь.
         payload: Данные нового пользователя.
+        session: Сессия запроса (get_request_session); если не передана, открывается своя.
 
     Returns:
         RegisterUserResponse: Информация о созданном пользователе.
@@ -31,21 +56,13 @@ async def create_user_in_organization(
         HTTPException: При ошибках валидации данных, конфликтах или проблемах с БД.
     """
     try:
-        async with db_manager.get_db_session() as session:
-            result_login = await session.execute(select(User).where(User.login == payload.login))
-            if result_login.scalars().first():
-                raise HTTPException(status_code=409, detail=f"Пользователь с логином '{payload.login}' уже существует")
-
-            result_email = await session.execute(select(User).where(User.email == payload.email))
-            if result_email.scalars().first():
-                raise HTTPException(status_code=409, detail=f"Пользователь с email '{payload.email}' уже существует")
-
-            result_role = await session.execute(select(Role).where(Role.name == payload.role))
-            role_obj = result_role.scalars().first()
-            if not role_obj:
+        # Хэш считается до начала транзакции: на время хэширования соединение не занято
+        hashed_password = await hash_password_async(payload.password)
+        async with db_manager.use_session(session) as session:
+            role_id = (await session.execute(select(Role.id).where(Role.name == payload.role))).scalar()
+            if role_id is None:
                  raise HTTPException(status_code=400, detail=f"Роль '{payload.role}' не найдена")
 
-            hashed_password = hash_password(payload.password)
             new_user = User(
                 organization_id=current_user_org_id,
                 login=payload.login,
@@ -54,14 +71,24 @@ async def create_user_in_organization(
                 email=payload.email,
                 password=hashed_password,
             )
-            session.add(new_user)
-            await session.flush()
+            # Уникальность login/email обеспечивают индексы: конфликт приходит как IntegrityError
+            try:
+                session.add(new_user)
+                await session.flush()
+                session.add_all(build_user_identifiers(new_user))
+                await session.flush()
+            except IntegrityError as e:
+                conflict = conflict_from_integrity_error(e, _user_conflict_messages(payload.login, payload.email))
+                if conflict is None:
+                    raise
+                raise conflict from e
 
             await session.execute(
-                insert(UserRoles).values(user_id=new_user.id, role_id=role_obj.id)
+                insert(UserRoles).values(user_id=new_user.id, role_id=role_id)
             )
 
             await session.commit()
+            invalidate_principal(new_user.id)
 
             logger.info(f"Пользователь '{new_user.login}' (ID: {new_user.id}) создан в организации ID {current_user_org_id}")
             return RegisterUserResponse(
@@ -78,14 +105,18 @@ async def change_user_status(
         current_user_org_id: int,
         payload: UserStatusChangeRequest,
         action: str,  # 'delete', 'block', 'unblock'
+        session: Optional[AsyncSession] = None,
 ) -> UserStatusChangeResponse:
     """
     Универсальная функция для изменения статуса пользователя в организации.
 
+    При блокировке и удалении в той же транзакции отзываются refresh-токены пользователя.
+
     Args:
         current_user_org_id: ID организации.
         payload: Данные пользователя (логин).
         action: Действие: 'delete', 'block' или 'unblock'.
+        session: Сессия запроса (get_request_session); если не передана, открывается своя.
 
     Returns:
         UserStatusChangeResponse: Результат операции.
@@ -93,7 +124,7 @@ async def change_user_status(
     Raises:
         HTTPException: Если пользователь не найден или действие недопустимо.
     """
-    async with db_manager.get_db_session() as session:
+    async with db_manager.use_session(session) as session:
         user = await session.execute(
             select(User).where(
                 User.login == payload.login_to_change,
@@ -110,7 +141,7 @@ async def change_user_status(
 
         if action == "delete":
             user_obj.is_deleted = True
-            user_obj.is_block = True
+            user_obj.is_blocked = True
             user_obj.is_active = False
             message = f"Пользователь '{payload.login_to_change}' успешно помечен как удалённый"
         elif action == "block":
@@ -119,7 +150,7 @@ async def change_user_status(
                     status_code=400,
                     detail=f"Невозможно заблокировать удалённого пользователя '{payload.login_to_change}'"
                 )
-            user_obj.is_block = True
+            user_obj.is_blocked = True
             user_obj.is_active = False
             message = f"Пользователь '{payload.login_to_change}' успешно заблокирован"
         elif action == "unblock":
@@ -128,14 +159,18 @@ async def change_user_status(
                     status_code=400,
                     detail=f"Невозможно разблокировать удалённого пользователя '{payload.login_to_change}'"
                 )
-            user_obj.is_block = False
+            user_obj.is_blocked = False
             user_obj.is_active = True
             message = f"Пользователь '{payload.login_to_change}' успешно разблокирован"
         else:
             raise HTTPException(status_code=400, detail=f"Неизвестное действие '{action}'")
 
         session.add(user_obj)
+        if action in ("block", "delete"):
+            # Без отзыва заблокированный пользователь продолжил бы получать access-токены через /auth/refresh
+            await _revoke_users_refresh_tokens(session, [user_obj.id])
         await session.commit()
+        invalidate_principal(user_obj.id)
 
         return UserStatusChangeResponse(
             success=True,
@@ -144,44 +179,255 @@ async def change_user_status(
         )
 
 
-async def fetch_users_with_roles_and_permissions(organization_id: int) -> GetUsersByOrgResponse:
-    async with db_manager.get_db_session() as session:
-        result = await session.execute(
-            select(User.id).where(User.organization_id == organization_id).limit(1)
+async def _revoke_users_refresh_tokens(session, user_ids) -> None:
+    """Отзывает все действующие refresh-токены пользователей (коммит — на стороне вызывающего)."""
+    await session.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.user_id == any_(bindparam("user_ids", list(user_ids), type_=ARRAY(Integer))),
+            RefreshToken.revoked == False,
         )
-        if not result.scalar():
-            raise HTTPException(
-                status_code=404,
-                detail=f"Организация с id={organization_id} не найдена"
-            )
+        .values(revoked=True, revoked_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+
+
+# Новые значения флагов и дополнительное условие отбора для массовой смены статуса
+_BULK_STATUS_ACTIONS = {
+    "delete": ({"is_deleted": True, "is_blocked": True, "is_active": False}, None),
+    "block": ({"is_blocked": True, "is_active": False}, User.is_deleted == False),
+    "unblock": ({"is_blocked": False, "is_active": True}, User.is_deleted == False),
+}
+
+
+def _bulk_target_condition(current_user_org_id: int, logins: list[str], user_ids: list[int]):
+    """Пользователи организации из списка логинов или id (массивы передаются одним параметром: = ANY(...))."""
+    return and_(
+        User.organization_id == current_user_org_id,
+        or_(
+            User.login == any_(bindparam("logins", logins, type_=ARRAY(String))),
+            User.id == any_(bindparam("user_ids", user_ids, type_=ARRAY(Integer))),
+        ),
+    )
+
+
+async def change_users_status_bulk(
+        current_user_org_id: int,
+        payload: BulkUserStatusChangeRequest,
+        action: str,  # 'delete', 'block', 'unblock'
+        session: Optional[AsyncSession] = None,
+) -> BulkUserStatusChangeResponse:
+    """
+    Массовое изменение статуса пользователей организации одним UPDATE ... RETURNING.
+
+    При блокировке и удалении в той же транзакции отзываются refresh-токены затронутых пользователей.
+
+    Args:
+        current_user_org_id: ID организации.
+        payload: Логины и/или id пользователей.
+        action: Действие: 'delete', 'block' или 'unblock'.
+        session: Сессия запроса (get_request_session); если не передана, открывается своя.
+
+    Returns:
+        BulkUserStatusChangeResponse: Результат по каждому переданному логину/id.
+
+    Raises:
+        HTTPException 400: Если список пуст, слишком велик или действие неизвестно.
+    """
+    if action not in _BULK_STATUS_ACTIONS:
+        raise HTTPException(status_code=400, detail=f"Неизвестное действие '{action}'")
+
+    logins = list(dict.fromkeys(payload.logins))
+    user_ids = list(dict.fromkeys(payload.user_ids))
+    if not logins and not user_ids:
+        raise HTTPException(status_code=400, detail="Не указаны пользователи (logins или user_ids)")
+    if len(logins) + len(user_ids) > settings.BULK_STATUS_CHANGE_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"За один запрос можно изменить не более {settings.BULK_STATUS_CHANGE_MAX_ITEMS} пользователей"
+        )
+
+    values, extra_condition = _BULK_STATUS_ACTIONS[action]
+    target = _bulk_target_condition(current_user_org_id, logins, user_ids)
+
+    async with db_manager.use_session(session) as session:
+        stmt = (
+            update(User)
+            .where(target, *([extra_condition] if extra_condition is not None else []))
+            .values(**values)
+            .returning(User.id, User.login)
+            .execution_options(synchronize_session=False)
+        )
+        changed = (await session.execute(stmt)).all()
+        changed_ids = {row.id for row in changed}
+
+        if changed_ids and action in ("block", "delete"):
+            await _revoke_users_refresh_tokens(session, changed_ids)
+
+        # Причины отказа нужны только для тех, кого UPDATE не затронул
+        skipped = {}
+        if len(changed) < len(logins) + len(user_ids):
+            rows = await session.execute(select(User.id, User.login, User.is_deleted).where(target))
+            skipped = {row.id: row for row in rows if row.id not in changed_ids}
+
+        await session.commit()
+
+    invalidate_principals(changed_ids)
+
+    changed_by_login = {row.login: row.id for row in changed}
+    skipped_by_login = {row.login: row for row in skipped.values()}
 
-        result = await session.execute(
-            select(User)
-            .where(
-                User.organization_id == organization_id,
-                User.is_deleted == False,
-                User.is_active == True,
-                User.is_blocked == False
+    def _item(login: Optional[str], user_id: Optional[int]) -> BulkUserStatusChangeItem:
+        if login is not None:
+            user_id = changed_by_login.get(login)
+            skipped_row = skipped_by_login.get(login)
+        else:
+            skipped_row = skipped.get(user_id)
+        if user_id is not None and user_id in changed_ids:
+            return BulkUserStatusChangeItem(login=login, user_id=user_id, success=True, message="Статус изменён")
+        if skipped_row is not None:
+            return BulkUserStatusChangeItem(
+                login=login, user_id=skipped_row.id, success=False,
+                message="Пользователь удалён, изменение статуса невозможно"
             )
-            .order_by(User.created_at)
+        return BulkUserStatusChangeItem(
+            login=login, user_id=user_id, success=False, message="Пользователь не найден в организации"
         )
-        users = result.scalars().all()
-
-        users_response = []
-        for u in users:
-            await session.refresh(u, ["roles"])
-            for role in u.roles:
-                await session.refresh(role, ["permissions"])
-
-            users_response.append(
-                UserResponse(
-                    login=u.login,
-                    first_name=u.first_name,
-                    last_name=u.last_name,
-                    email=u.email,
-                    access_level=u.roles[0].name if u.roles else "user",
-                    permissions=list({perm.code for role in u.roles for perm in role.permissions})
-                )
+
+    results = [_item(login, None) for login in logins] + [_item(None, user_id) for user_id in user_ids]
+    logger.info(
+        "Bulk '%s' in organization %s: %d of %d users changed",
+        action, current_user_org_id, len(changed_ids), len(results),
+    )
+    return BulkUserStatusChangeResponse(updated=len(changed_ids), results=results)
+
+
+def _user_roles_subquery():
+    """Массив ролей пользователя (коррелированный подзапрос, порядок — по id роли)."""
+    return (
+        select(func.array_agg(aggregate_order_by(Role.name, Role.id)))
+        .select_from(UserRoles)
+        .join(Role, Role.id == UserRoles.c.role_id)
+        .where(UserRoles.c.user_id == User.id)
+        .scalar_subquery()
+    )
+
+
+def _user_permissions_subquery():
+    """Массив уникальных кодов прав пользователя по всем его ролям."""
+    return (
+        select(func.array_agg(distinct(Permission.code)))
+        .select_from(UserRoles)
+        .join(RolePermissions, RolePermissions.c.role_id == UserRoles.c.role_id)
+        .join(Permission, Permission.id == RolePermissions.c.permission_id)
+        .where(UserRoles.c.user_id == User.id)
+        .scalar_subquery()
+    )
+
+
+def _user_status_condition(user_status: str):
+    if user_status == "active":
+        return and_(User.is_deleted == False, User.is_active == True, User.is_blocked == False)
+    if user_status == "blocked":
+        return and_(User.is_deleted == False, or_(User.is_blocked == True, User.is_active == False))
+    if user_status == "deleted":
+        return User.is_deleted == True
+    raise HTTPException(status_code=400, detail=f"Неизвестный статус '{user_status}'")
+
+
+async def fetch_users_with_roles_and_permissions(
+        organization_id: int,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        role: Optional[str] = None,
+        permission: Optional[str] = None,
+        user_status: str = "active",
+        session: Optional[AsyncSession] = None,
+) -> GetUsersByOrgResponse:
+    """
+    Возвращает страницу пользователей организации с ролями и правами.
+
+    Пагинация keyset по (created_at, id), опирается на индекс users(organization_id, created_at, id).
+
+    Args:
+        organization_id: ID организации.
+        limit: Размер страницы.
+        cursor: next_cursor из предыдущей страницы.
+        role: Только пользователи с этой ролью.
+        permission: Только пользователи с этим правом.
+        user_status: 'active', 'blocked' или 'deleted'.
+        session: Сессия запроса (get_request_session); если не передана, открывается своя.
+
+    Raises:
+        HTTPException: 400 при некорректном cursor/статусе, 404 если организация не найдена.
+    """
+    query = (
+        select(
+            User.id,
+            User.created_at,
+            User.login,
+            User.first_name,
+            User.last_name,
+            User.email,
+            _user_roles_subquery().label("roles"),
+            _user_permissions_subquery().label("permissions"),
+        )
+        .where(User.organization_id == organization_id, _user_status_condition(user_status))
+        .order_by(User.created_at, User.id)
+        .limit(limit + 1)
+    )
+
+    if cursor:
+        try:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Некорректный cursor")
+        query = query.where(tuple_(User.created_at, User.id) > tuple_(cursor_created_at, cursor_id))
+
+    if role:
+        query = query.where(
+            exists()
+            .where(UserRoles.c.user_id == User.id)
+            .where(Role.id == UserRoles.c.role_id, Role.name == role)
+        )
+
+    if permission:
+        query = query.where(
+            exists()
+            .where(UserRoles.c.user_id == User.id)
+            .where(RolePermissions.c.role_id == UserRoles.c.role_id)
+            .where(Permission.id == RolePermissions.c.permission_id, Permission.code == permission)
+        )
+
+    async with db_manager.use_session(session) as session:
+        rows = (await session.execute(query)).all()
+
+        if not rows and not cursor:
+            # Пустой список — проверяем, есть ли у организации пользователи вообще
+            exists_result = await session.execute(
+                select(User.id).where(User.organization_id == organization_id).limit(1)
             )
+            if not exists_result.scalar():
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Организация с id={organization_id} не найдена"
+                )
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    users_response = [
+        UserResponse(
+            login=row.login,
+            first_name=row.first_name,
+            last_name=row.last_name,
+            email=row.email,
+            access_level=row.roles[0] if row.roles else "user",
+            permissions=row.permissions or [],
+        )
+        for row in rows
+    ]
 
-        return GetUsersByOrgResponse(users=users_response)
\ No newline at end of file
+    return GetUsersByOrgResponse(users=users_response, next_cursor=next_cursor)
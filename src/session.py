@@ -1,35 +1,142 @@
+import time
 from contextlib import asynccontextmanager
 from logging import getLogger
+from typing import AsyncIterator, Optional
 
+from sqlalchemy import event
 from sqlalchemy.exc import DatabaseError
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
+from src.core.metrics import (
+    db_pool_checked_out,
+    db_pool_checkout_wait_seconds,
+    db_pool_overflow,
+    db_pool_size,
+    metrics,
+)
+from src.core.timing import request_counters, timed
 from src.db_clients.config import db_settings
 
 logger = getLogger(__name__)
 
 
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул, измеряющий ожидание соединения (db_pool_checkout_wait_seconds) при любом способе его получения:
+    ленивая сессия запроса, get_db_session, engine.connect(). События пула checkout/connect
+    срабатывают только после получения соединения, поэтому время снимается вокруг Pool.connect().
+    """
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            db_pool_checkout_wait_seconds.observe(time.perf_counter() - started)
+
+
 class DBManager:
-    def __init__(self, db_url: str):
-        self.engine = create_async_engine(
-            db_url,
-            pool_pre_ping=True,             # проверяет соединение перед использованием
-            pool_recycle=1800,              # обновляет соединение каждые 30 мин
-            connect_args={"timeout": 160},
-        )
-        self.session_factory = async_sessionmaker(self.engine, expire_on_commit=False)
-        
+    """
+    Движок и фабрика сессий создаются в init() (из lifespan приложения), а не при импорте;
+    утилиты вне приложения получают их лениво при первом обращении.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self._engine: Optional[AsyncEngine] = None
+        self._session_factory: Optional[async_sessionmaker] = None
+
+    def init(self) -> None:
+        if self._engine is None:
+            self._engine = create_async_engine(
+                self.config.get_async_url(), poolclass=TimedAsyncQueuePool, **self.config.get_engine_options()
+            )
+            self._session_factory = async_sessionmaker(self._engine, expire_on_commit=False)
+
+    async def dispose(self) -> None:
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
+            self._session_factory = None
+
+    @property
+    def engine(self) -> AsyncEngine:
+        self.init()
+        return self._engine
+
+    @property
+    def session_factory(self) -> async_sessionmaker:
+        self.init()
+        return self._session_factory
+
+    def collect_pool_metrics(self) -> None:
+        if self._engine is None:
+            return
+        pool = self._engine.pool
+        db_pool_size.set(pool.size())
+        db_pool_checked_out.set(pool.checkedout())
+        db_pool_overflow.set(max(0, pool.overflow()))
+
+    @staticmethod
+    def _count_checkouts(session: AsyncSession) -> None:
+        """Считает соединения, которые сессия берёт из пула, в счётчиках текущего HTTP-запроса."""
+        counters = request_counters()
+        if counters is None:
+            return
+
+        # Слушатель вызывается из sync-кода SQLAlchemy, поэтому счётчики захватываются заранее
+        def after_begin(sync_session, transaction, connection):
+            counters["db_checkouts"] += 1
+
+        event.listen(session.sync_session, "after_begin", after_begin)
+
     @asynccontextmanager
     async def get_db_session(self):
+        # Время жизни сессии идёт в категорию db Server-Timing; вложенные таймеры (bcrypt, JWT) исключаются
+        async with self.session_factory() as session:
+            self._count_checkouts(session)
+            with timed("db"):
+                try:
+                    yield session
+                except DatabaseError as e:
+                    await session.rollback()
+                    logger.error(f'Ошибка подключения к базе данных: {e}')
+                    raise
+                finally:
+                    await session.close()
+
+    @asynccontextmanager
+    async def lazy_session(self):
+        """
+        Сессия на весь HTTP-запрос: соединение берётся из пула только при первом обращении к БД,
+        поэтому запрос, обслуженный из кэшей, пул не трогает.
+        """
         async with self.session_factory() as session:
+            self._count_checkouts(session)
             try:
                 yield session
             except DatabaseError as e:
                 await session.rollback()
                 logger.error(f'Ошибка подключения к базе данных: {e}')
                 raise
-            finally:
-                await session.close()
-        
 
-db_manager = DBManager(db_settings.db.get_async_url())
\ No newline at end of file
+    @asynccontextmanager
+    async def use_session(self, session: Optional[AsyncSession] = None):
+        """Переданная сессия запроса или, если её нет, собственная сессия get_db_session."""
+        if session is not None:
+            with timed("db"):
+                yield session
+            return
+        async with self.get_db_session() as own_session:
+            yield own_session
+
+
+db_manager = DBManager(db_settings.db)
+metrics.add_collector(db_manager.collect_pool_metrics)
+
+
+async def get_request_session() -> AsyncIterator[AsyncSession]:
+    """FastAPI-зависимость: одна ленивая сессия на запрос, общая для валидатора токена и сервисов."""
+    async with db_manager.lazy_session() as session:
+        yield session
@@ -0,0 +1,62 @@
+# src/utils/db_errors.py
+import re
+from typing import Hashable, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy.exc import IntegrityError
+
+UNIQUE_VIOLATION = "23505"
+
+_CONSTRAINT_RE = re.compile(r'unique constraint "([^"]+)"')
+_KEY_VALUE_RE = re.compile(r"Key \([^)]*\)=\((.*)\) already exists")
+
+
+def _driver_error(exc: IntegrityError):
+    """Исходное исключение драйвера (asyncpg оборачивается адаптером SQLAlchemy, psycopg2 — нет)."""
+    orig = exc.orig
+    return getattr(orig, "__cause__", None) or orig
+
+
+def unique_violation(exc: IntegrityError) -> Optional[tuple[Optional[str], Optional[str]]]:
+    """
+    Разбирает нарушение уникального индекса.
+    Возвращает (имя индекса, конфликтующее значение) или None, если это другая ошибка целостности.
+    """
+    driver_error = _driver_error(exc)
+    sqlstate = (
+        getattr(driver_error, "sqlstate", None)
+        or getattr(driver_error, "pgcode", None)
+        or getattr(exc.orig, "sqlstate", None)
+    )
+    message = str(exc.orig)
+    if sqlstate != UNIQUE_VIOLATION and "unique constraint" not in message:
+        return None
+
+    diag = getattr(driver_error, "diag", None)  # psycopg2
+    constraint = getattr(driver_error, "constraint_name", None) or getattr(diag, "constraint_name", None)
+    if constraint is None:
+        match = _CONSTRAINT_RE.search(message)
+        constraint = match.group(1) if match else None
+
+    detail = getattr(driver_error, "detail", None) or getattr(diag, "message_detail", None) or message
+    match = _KEY_VALUE_RE.search(detail)
+    return constraint, (match.group(1) if match else None)
+
+
+def conflict_from_integrity_error(exc: IntegrityError, messages: dict[Hashable, str]) -> Optional[HTTPException]:
+    """
+    Переводит нарушение уникального индекса в 409 с понятным сообщением.
+
+    Ключи messages — имя индекса либо пара (имя индекса, значение), если сообщение
+    зависит от конфликтующего значения (например, общий индекс идентификаторов входа).
+    Возвращает None, если ошибка не распознана — тогда её следует пробросить дальше.
+    """
+    violation = unique_violation(exc)
+    if violation is None:
+        return None
+
+    constraint, value = violation
+    detail = messages.get((constraint, value)) or messages.get(constraint)
+    if detail is None:
+        return None
+    return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
@@ -1,33 +1,56 @@
 # src/utils/jwt_utils.py
+import hashlib
 import logging
 from datetime import datetime, timedelta
+from typing import Optional
 import uuid
 import jwt
 from jwt import ExpiredSignatureError, InvalidTokenError
-from sqlalchemy import update
+from sqlalchemy import func, update
 from src.models.user_models import RefreshToken
 from fastapi import HTTPException, status
 
 from src.core.configuration.config import settings
+from src.core.log_sampling import SampledLogger
+from src.core.metrics import jwt_duration_seconds
+from src.core.timing import timed
 
 logger = logging.getLogger(__name__)
 
+# Ошибки токенов идут потоком (каждый просроченный access-токен) — пишем выборочно
+invalid_type_log = SampledLogger(logger, "jwt.invalid_type")
+expired_log = SampledLogger(logger, "jwt.expired")
+invalid_log = SampledLogger(logger, "jwt.invalid")
+
 # --- Функции для создания токенов ---
 
-async def create_access_token(user_id: int) -> str:
-    """Создает JWT access токен."""
+async def create_access_token(user_id: int, principal: Optional[dict] = None) -> str:
+    """
+    Создает JWT access токен.
+    В stateless-режиме добавляет в токен организацию, роли и права из principal.
+    """
     expires_delta = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode = {
         "sub": str(user_id),
         "exp": datetime.utcnow() + expires_delta,
         "type": "access",
     }
-    encoded_jwt = jwt.encode(
-        to_encode,
-        settings.JWT_SECRET_KEY,
-        algorithm=settings.JWT_ALGORITHM,
-    )
-    logger.debug(f"Created access token for user_id={user_id}")
+    if settings.STATELESS_ACCESS_TOKENS and principal is not None:
+        to_encode.update(
+            {
+                "organization_id": principal["organization_id"],
+                "roles": list(principal["roles"]),
+                "permissions": list(principal["permissions"]),
+                "pv": settings.ACCESS_TOKEN_CLAIMS_VERSION,
+            }
+        )
+    with jwt_duration_seconds.time(operation="encode"), timed("jwt"):
+        encoded_jwt = jwt.encode(
+            to_encode,
+            settings.JWT_SECRET_KEY,
+            algorithm=settings.JWT_ALGORITHM,
+        )
+    logger.debug("Created access token for user_id=%s", user_id)
     return encoded_jwt
 
 
@@ -41,35 +64,44 @@ async def create_refresh_token(user_id: int) -> tuple[str, str]:
         "exp": datetime.utcnow() + expires_delta,
         "type": "refresh",
     }
-    encoded_jwt = jwt.encode(
-        to_encode,
-        settings.JWT_SECRET_KEY,
-        algorithm=settings.JWT_ALGORITHM,
-    )
-    logger.debug(f"Created refresh token for user_id={user_id}, jti={jti}")
+    with jwt_duration_seconds.time(operation="encode"), timed("jwt"):
+        encoded_jwt = jwt.encode(
+            to_encode,
+            settings.JWT_SECRET_KEY,
+            algorithm=settings.JWT_ALGORITHM,
+        )
+    logger.debug("Created refresh token for user_id=%s, jti=%s", user_id, jti)
     return encoded_jwt, jti
 
 
+def hash_refresh_token(token: str) -> str:
+    """Возвращает SHA-256 (hex) refresh токена — в БД хранится только он."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
 # --- Функции для декодирования и валидации токенов ---
 
-def decode_jwt_token(token: str, expected_type: str = None) -> dict:
+def decode_jwt_token(token: str, expected_type: str = None, verify_exp: bool = True) -> dict:
     """
     Декодирует и проверяет базовую валидность JWT токена.
     :param token: Сам JWT токен.
     :param expected_type: Ожидаемый тип токена ('access', 'refresh').
+    :param verify_exp: Проверять ли срок действия токена.
     :return: Payload токена.
     :raises HTTPException: Если токен недействителен.
     """
     try:
-        payload = jwt.decode(
-            token,
-            settings.JWT_SECRET_KEY,
-            algorithms=[settings.JWT_ALGORITHM],
-        )
+        with jwt_duration_seconds.time(operation="decode"), timed("jwt"):
+            payload = jwt.decode(
+                token,
+                settings.JWT_SECRET_KEY,
+                algorithms=[settings.JWT_ALGORITHM],
+                options={"verify_exp": verify_exp},
+            )
 
         if expected_type and payload.get("type") != expected_type:
-            logger.warning(
-                f"Invalid token type: expected '{expected_type}', got '{payload.get('type')}'"
+            invalid_type_log.warning(
+                "Invalid token type: expected '%s', got '%s'", expected_type, payload.get("type")
             )
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -77,22 +109,24 @@ def decode_jwt_token(token: str, expected_type: str = None) -> dict:
             )
 
         logger.debug(
-            f"Decoded JWT token for sub={payload.get('sub')}, type={payload.get('type')}"
+            "Decoded JWT token for sub=%s, type=%s", payload.get("sub"), payload.get("type")
         )
         return payload
 
+    except HTTPException:
+        raise
     except ExpiredSignatureError:
-        logger.warning("JWT token expired")
+        expired_log.warning("JWT token expired")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired"
         )
     except InvalidTokenError as e:
-        logger.warning(f"Invalid JWT token: {e}")
+        invalid_log.warning("Invalid JWT token: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token"
         )
     except Exception as e:
-        logger.error(f"Unexpected error during JWT decoding: {e}")
+        logger.error("Unexpected error during JWT decoding: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal token validation error",
@@ -108,9 +142,9 @@ async def revoke_existing_tokens(session, user_id: int):
             RefreshToken.revoked == False,
             RefreshToken.expires_at > datetime.utcnow(),
         )
-        .values(revoked=True)
+        .values(revoked=True, revoked_at=func.now())
     )
     result = await session.execute(stmt)
     logger.debug(
-        f"Revoked {result.rowcount} existing refresh tokens for user_id={user_id}"
+        "Revoked %s existing refresh tokens for user_id=%s", result.rowcount, user_id
     )
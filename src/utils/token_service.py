@@ -1,95 +1,213 @@
 # src/utils/token_service.py
+import asyncio
 import logging
 from datetime import datetime, timedelta
+from typing import Optional
 from fastapi import HTTPException, status
-from sqlalchemy import select, update
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # Импортируем нужные функции из jwt_utils
 from src.utils.jwt_utils import (
     create_access_token,
     create_refresh_token,
     decode_jwt_token,
+    hash_refresh_token,
     # revoke_existing_tokens, # Если revoke_existing_tokens перенесена в jwt_utils, импортируем оттуда
 )
 from src.models.user_models import RefreshToken, User
+from src.services.principal_service import get_principal
 from src.session import db_manager
+from src.core.cache import TTLCache
 from src.core.configuration.config import settings
+from src.core.log_sampling import SampledLogger
+from src.core.metrics import cache_collector, metrics
 
 logger = logging.getLogger(__name__)
+# Свой семплер у каждой причины отказа: поток одних отказов не прячет редкие другие
+malformed_refresh_log = SampledLogger(logger, "refresh_token.malformed")
+refresh_not_found_log = SampledLogger(logger, "refresh_token.not_found")
+refresh_revoked_log = SampledLogger(logger, "refresh_token.revoked")
+refresh_expired_log = SampledLogger(logger, "refresh_token.expired")
+refresh_user_inactive_log = SampledLogger(logger, "refresh_token.user_inactive")
+
+# Результаты ротации по jti старого токена: повтор того же refresh в течение
+# REFRESH_REUSE_GRACE_SECONDS получает ту же новую пару вместо 401 (несколько вкладок, ретраи).
+# Значение — (access, refresh, jti нового refresh)
+rotated_tokens = TTLCache(
+    maxsize=settings.REFRESH_REUSE_CACHE_MAXSIZE,
+    ttl=settings.REFRESH_REUSE_GRACE_SECONDS,
+)
+# Обратная связь jti нового refresh -> jti старого: отзыв новой пары сбрасывает и запись grace-окна
+_rotated_from = TTLCache(
+    maxsize=settings.REFRESH_REUSE_CACHE_MAXSIZE,
+    ttl=settings.REFRESH_REUSE_GRACE_SECONDS,
+)
+metrics.add_collector(cache_collector("rotated_refresh_tokens", rotated_tokens))
+# Ротации, выполняющиеся прямо сейчас: параллельные запросы с тем же jti ждут их результата
+_rotations_in_flight: dict[str, asyncio.Future] = {}
+
+
+# --- Запросы к refresh токенам: строятся один раз, на вызове передаются только параметры ---
+
+# Состояние refresh токена и статус его пользователя одним чтением по уникальному индексу jti
+REFRESH_TOKEN_WITH_USER_STATUS = (
+    select(
+        RefreshToken.revoked,
+        (RefreshToken.expires_at <= func.now()).label("expired"),
+        User.is_active,
+        User.is_blocked,
+        User.is_deleted,
+    )
+    .join(User, User.id == RefreshToken.user_id)
+    .where(RefreshToken.jti == bindparam("jti"), RefreshToken.user_id == bindparam("user_id"))
+)
+
+# Условный отзыв токена пользователя при ротации
+REVOKE_USER_REFRESH_TOKEN = (
+    update(RefreshToken)
+    .where(
+        RefreshToken.jti == bindparam("jti"),
+        RefreshToken.user_id == bindparam("user_id"),
+        RefreshToken.revoked == False,
+        RefreshToken.expires_at > func.now(),
+    )
+    .values(revoked=True, revoked_at=func.now())
+    .returning(RefreshToken.user_id)
+)
+
+REFRESH_TOKEN_STATE = select(RefreshToken.revoked, RefreshToken.expires_at <= func.now()).where(
+    RefreshToken.jti == bindparam("jti"), RefreshToken.user_id == bindparam("user_id")
+)
+
+# Отзыв при logout — только по jti
+REVOKE_REFRESH_TOKEN_BY_JTI = (
+    update(RefreshToken)
+    .where(
+        RefreshToken.jti == bindparam("jti"),
+        RefreshToken.revoked == False,
+        RefreshToken.expires_at > func.now(),
+    )
+    .values(revoked=True, revoked_at=func.now())
+    .returning(RefreshToken.id)
+)
+
+REFRESH_TOKEN_STATE_BY_JTI = select(RefreshToken.revoked, RefreshToken.expires_at <= func.now()).where(
+    RefreshToken.jti == bindparam("jti")
+)
 
 
 # --- Работа с refresh токенами в БД ---
 
-async def get_refresh_token_from_db(jti: str, user_id: int):
-    """Получает refresh токен из БД по jti и user_id."""
+async def check_refresh_token_for_access(jti: str, user_id: int, session: Optional[AsyncSession] = None) -> None:
+    """
+    Проверяет, что refresh токен действует, а пользователь активен: одно чтение, без записей.
+    Используется при выпуске access токена без ротации и при повторной выдаче пары в grace-окне.
+    Если передана session (сессия запроса), чтение выполняется в ней.
+    :raises HTTPException 401: Если токен не найден, отозван, истёк или пользователь неактивен.
+    """
     try:
-        async with db_manager.get_db_session() as session:
-            result = await session.execute(
-                select(RefreshToken).where(
-                    RefreshToken.jti == jti, RefreshToken.user_id == user_id
-                )
-            )
-            return result.scalar_one_or_none()
+        async with db_manager.use_session(session) as session:
+            row = (
+                await session.execute(REFRESH_TOKEN_WITH_USER_STATUS, {"jti": jti, "user_id": user_id})
+            ).one_or_none()
     except Exception as e:
-        logger.error(f"Database error fetching refresh token: {e}")
+        logger.error("Database error fetching refresh token: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Database error",
         )
 
+    if row is None:
+        refresh_not_found_log.warning("Refresh token with jti=%s not found in DB (no rotation)", jti)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
 
-async def revoke_refresh_token_in_db(jti: str):
-    """Помечает refresh токен как отозванный в БД."""
-    try:
-        async with db_manager.get_db_session() as session:
-            await session.execute(
-                update(RefreshToken).where(RefreshToken.jti == jti).values(revoked=True)
-            )
-            await session.commit()
-            logger.debug(f"Revoked refresh token jti={jti}")
-    except Exception as e:
-        logger.error(f"Database error revoking refresh token: {e}")
+    if row.revoked:
+        refresh_revoked_log.warning("Refresh token with jti=%s is revoked (no rotation)", jti)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token revoked")
+
+    if row.expired:
+        refresh_expired_log.warning("Refresh token with jti=%s is expired (no rotation)", jti)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token expired")
+
+    if not row.is_active or row.is_blocked or row.is_deleted:
+        refresh_user_inactive_log.warning("User %s is blocked, deleted or inactive, refresh token refused", user_id)
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Database error",
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="User is blocked, deleted or inactive"
         )
 
 
-async def save_refresh_token_to_db(user_id: int, token: str, jti: str):
-    """Сохраняет новый refresh токен в БД."""
-    try:
-        expires_at = datetime.utcnow() + timedelta(
-            days=settings.REFRESH_TOKEN_EXPIRE_DAYS
-        )
-        new_db_token = RefreshToken(
+async def revoke_refresh_token_in_db(session, jti: str, user_id: int) -> bool:
+    """
+    Атомарно отзывает действующий refresh токен.
+    Возвращает False, если токен не найден, уже отозван или истёк.
+    """
+    result = await session.execute(REVOKE_USER_REFRESH_TOKEN, {"jti": jti, "user_id": user_id})
+    revoked = result.scalar_one_or_none() is not None
+    if revoked:
+        logger.debug("Revoked refresh token jti=%s", jti)
+    return revoked
+
+
+def save_refresh_token_to_db(session, user_id: int, token: str, jti: str):
+    """Добавляет новый refresh токен в сессию (коммит — на стороне вызывающего)."""
+    expires_at = datetime.utcnow() + timedelta(
+        days=settings.REFRESH_TOKEN_EXPIRE_DAYS
+    )
+    session.add(
+        RefreshToken(
             user_id=user_id,
-            token=token,
+            token=hash_refresh_token(token),
             jti=jti,
             expires_at=expires_at,
             revoked=False,
         )
-        async with db_manager.get_db_session() as session:
-            session.add(new_db_token)
-            await session.commit()
-            logger.debug(f"Saved new refresh token for user_id={user_id}, jti={jti}")
-    except Exception as e:
-        logger.error(f"Database error saving refresh token: {e}")
+    )
+    logger.debug("Saved new refresh token for user_id=%s, jti=%s", user_id, jti)
+
+
+async def raise_refresh_token_rejected(session, jti: str, user_id: int):
+    """Выясняет, почему refresh токен не прошёл проверку, и выбрасывает соответствующий 401."""
+    result = await session.execute(REFRESH_TOKEN_STATE, {"jti": jti, "user_id": user_id})
+    token = result.one_or_none()
+
+    if not token:
+        refresh_not_found_log.warning("Refresh token with jti=%s not found in DB", jti)
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Database error",
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token"
+        )
+
+    revoked, expired = token
+    if revoked:
+        refresh_revoked_log.warning("Refresh token with jti=%s is revoked", jti)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token revoked"
         )
 
+    if expired:
+        refresh_expired_log.warning("Refresh token with jti=%s is expired", jti)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token expired"
+        )
+
+    # Токен был действителен, но его успел отозвать параллельный запрос
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token revoked"
+    )
+
 
 # --- Высокоуровневые функции ---
 
-async def rotate_refresh_token(old_refresh_token: str) -> tuple[str, str]:
+async def rotate_refresh_token(old_refresh_token: str, session: Optional[AsyncSession] = None) -> tuple[str, str]:
     """
     Высокоуровневая функция для ротации refresh токена.
     1. Декодирует старый токен.
-    2. Проверяет его в БД.
-    3. Отзывает старый.
-    4. Создает и сохраняет новый.
-    5. Создает новый access токен.
+    2. В одной транзакции условно отзывает его (UPDATE ... RETURNING).
+    3. В той же транзакции сохраняет новый.
+    4. Создает новый access токен.
+    Параллельные ротации одного jti в воркере объединяются, а повтор в течение
+    REFRESH_REUSE_GRACE_SECONDS получает уже выданную пару, пока её refresh не отозван.
+    Если передана session (сессия запроса), обращения к БД выполняются в ней.
     :return: (new_access_token, new_refresh_token)
     """
     payload = decode_jwt_token(old_refresh_token, expected_type="refresh")
@@ -97,7 +215,7 @@ async def rotate_refresh_token(old_refresh_token: str) -> tuple[str, str]:
     user_id_str = payload.get("sub")
 
     if not jti or not user_id_str:
-        logger.warning("Missing jti or sub in refresh token")
+        malformed_refresh_log.warning("Missing jti or sub in refresh token")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token"
         )
@@ -105,93 +223,151 @@ async def rotate_refresh_token(old_refresh_token: str) -> tuple[str, str]:
     try:
         user_id = int(user_id_str)
     except (ValueError, TypeError):
-        logger.warning(f"Invalid user_id in refresh token: {user_id_str}")
+        malformed_refresh_log.warning("Invalid user_id in refresh token: %s", user_id_str)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token"
         )
 
-    db_token = await get_refresh_token_from_db(jti, user_id)
-    if not db_token:
-        logger.warning(f"Refresh token with jti={jti} not found in DB")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token"
-        )
+    # Тот же токен только что ротировали — отдаём ту же пару, если её refresh ещё действует
+    # (проверка в БД видит и logout/блокировку, выполненные другим воркером)
+    rotated = rotated_tokens.get(jti)
+    if rotated is not None:
+        new_access_token, new_refresh_token, new_jti = rotated
+        try:
+            await check_refresh_token_for_access(new_jti, user_id, session=session)
+        except HTTPException as e:
+            if e.status_code == status.HTTP_401_UNAUTHORIZED:
+                rotated_tokens.invalidate(jti)
+            raise
+        logger.debug("Refresh token jti=%s reused within grace window", jti)
+        return new_access_token, new_refresh_token
 
-    if db_token.revoked:
-        logger.warning(f"Refresh token with jti={jti} is revoked")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token revoked"
-        )
+    # Ротация этого токена уже идёт в воркере — ждём её результат, а не получаем 401
+    in_flight = _rotations_in_flight.get(jti)
+    if in_flight is not None:
+        logger.debug("Coalescing concurrent refresh of jti=%s", jti)
+        return await asyncio.shield(in_flight)
 
-    if db_token.expires_at < datetime.utcnow():
-        logger.warning(f"Refresh token with jti={jti} is expired")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token expired"
-        )
+    future = asyncio.get_running_loop().create_future()
+    _rotations_in_flight[jti] = future
+    try:
+        result = await _rotate_refresh_token(jti, user_id, session=session)
+    except asyncio.CancelledError:
+        # Отмена запроса-лидера (например, клиент отключился) не должна отменять чужие запросы:
+        # ожидающие получают ошибку, после которой запрос можно повторить
+        future.set_exception(HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Token rotation was interrupted, retry the request",
+            headers={"Retry-After": "1"},
+        ))
+        future.exception()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Помечаем исключение полученным, даже если ожидающих не было
+        future.exception()
+        raise
+    else:
+        new_access_token, new_refresh_token, new_jti = result
+        rotated_tokens.set(jti, result)
+        _rotated_from.set(new_jti, jti)
+        future.set_result((new_access_token, new_refresh_token))
+        return new_access_token, new_refresh_token
+    finally:
+        _rotations_in_flight.pop(jti, None)
 
-    await revoke_refresh_token_in_db(jti)
+
+async def _rotate_refresh_token(
+    jti: str, user_id: int, session: Optional[AsyncSession] = None
+) -> tuple[str, str, str]:
+    """
+    Отзывает старый refresh токен и сохраняет новый в одной транзакции.
+    :return: (new_access_token, new_refresh_token, jti нового refresh токена)
+    """
     new_refresh_token_str, new_jti = await create_refresh_token(user_id=user_id)
-    await save_refresh_token_to_db(user_id=user_id, token=new_refresh_token_str, jti=new_jti)
 
     try:
-        async with db_manager.get_db_session() as session:
-            user_result = await session.execute(select(User).where(User.id == user_id))
-            user_obj = user_result.scalar_one_or_none()
-            if not user_obj:
-                logger.error(f"User with id={user_id} not found during token rotation")
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="User data error",
-                )
+        async with db_manager.use_session(session) as session:
+            try:
+                if not await revoke_refresh_token_in_db(session, jti, user_id):
+                    await raise_refresh_token_rejected(session, jti, user_id)
+
+                principal = await get_principal(user_id, session=session)
+                if not principal:
+                    logger.error("User with id=%s not found during token rotation", user_id)
+                    raise HTTPException(
+                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        detail="User data error",
+                    )
+
+                if not principal["is_active"] or principal["is_blocked"] or principal["is_deleted"]:
+                    refresh_user_inactive_log.warning(
+                        "User %s is blocked, deleted or inactive, token rotation refused", user_id
+                    )
+                    raise HTTPException(
+                        status_code=status.HTTP_401_UNAUTHORIZED, detail="User is blocked, deleted or inactive"
+                    )
 
-            await session.refresh(user_obj, ["roles"])  
-            new_access_token_str = await create_access_token(user_id=user_id)
+                save_refresh_token_to_db(session, user_id=user_id, token=new_refresh_token_str, jti=new_jti)
+                await session.commit()
+            except Exception:
+                # Сессия запроса живёт дольше ротации: отзыв старого токена не должен остаться в транзакции
+                await session.rollback()
+                raise
 
-            return new_access_token_str, new_refresh_token_str
+        new_access_token_str = await create_access_token(user_id=user_id, principal=principal)
+        return new_access_token_str, new_refresh_token_str, new_jti
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error creating new access token during rotation: {e}")
+        logger.error("Error during refresh token rotation: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error generating new tokens",
         )
 
+
 async def revoke_one_token(session, refresh_token: str):
-    """Отзывает один валидный токен"""
-    try:
-        await validate_token(session, refresh_token)
-    except HTTPException:
-        raise
+    """Отзывает один валидный токен: поиск по jti и отзыв одним UPDATE ... RETURNING"""
+    payload = decode_jwt_token(refresh_token, expected_type="refresh", verify_exp=False)
+    jti = payload.get("jti")
+    if not jti:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail='Невалидный токен'
+        )
 
-    stmt = (
-        update(RefreshToken)
-        .where(RefreshToken.token == refresh_token)
-        .values(revoked=True)
-    )
-    await session.execute(stmt)
+    rotated_tokens.invalidate(jti)
+    # Отзывается пара, выданная ротацией: старый токен больше не должен получать её в grace-окне
+    rotated_from = _rotated_from.get(jti)
+    if rotated_from is not None:
+        rotated_tokens.invalidate(rotated_from)
+        _rotated_from.invalidate(jti)
+    result = await session.execute(REVOKE_REFRESH_TOKEN_BY_JTI, {"jti": jti})
+    if result.scalar_one_or_none() is None:
+        await validate_token(session, jti)
 
 
-async def validate_token(session, refresh_token: str):
-    """Проверяет токен на валидность"""
-    stmt = select(RefreshToken).where(RefreshToken.token == refresh_token)
-    result = await session.execute(stmt)
-    token = result.scalar_one_or_none()
+async def validate_token(session, jti: str):
+    """Проверяет токен на валидность и объясняет, почему его нельзя отозвать"""
+    result = await session.execute(REFRESH_TOKEN_STATE_BY_JTI, {"jti": jti})
+    token = result.one_or_none()
 
     if not token:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail='Невалидный токен'
         )
-    
-    if token.revoked:
+
+    revoked, expired = token
+    if revoked:
         raise HTTPException(
             status_code=status.HTTP_200_OK,
             detail='Токен уже инвалидирован'
         )
     
-    if token.expires_at < datetime.utcnow():
+    if expired:
         raise HTTPException(
             status_code=status.HTTP_200_OK,
             detail='У токена закончился срок действия'
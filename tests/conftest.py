@@ -0,0 +1,25 @@
+import os
+
+import pytest
+
+# Модули читают настройки БД при импорте; тестам без .env хватает фиктивных значений (подключений они не делают)
+for _suffix in ("DEV", "PROD"):
+    os.environ.setdefault(f"PG_DB_{_suffix}", "test_db")
+    os.environ.setdefault(f"PG_USER_{_suffix}", "test_user")
+    os.environ.setdefault(f"PG_PASSWORD_{_suffix}", "test_password")
+    os.environ.setdefault(f"PG_HOST_{_suffix}", "localhost")
+    os.environ.setdefault(f"PG_PORT_{_suffix}", "5432")
+
+
+def pytest_addoption(parser):
+    parser.addoption("--benchmark", action="store_true", help="run timing comparisons (marker 'benchmark')")
+
+
+def pytest_collection_modifyitems(config, items):
+    # Замеры времени зависят от машины и нагрузки — в обычный прогон не входят
+    if config.getoption("--benchmark"):
+        return
+    skip = pytest.mark.skip(reason="timing comparison, run with --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
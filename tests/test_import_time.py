@@ -0,0 +1,50 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Бюджет холодного импорта приложения (кумулятивное время src.server по -X importtime)
+IMPORT_TIME_BUDGET_SECONDS = 2.5
+
+PROBE = """
+import json, sys
+import src.server
+from src.core.logger import logger_manager
+from src.session import db_manager
+print(json.dumps({
+    "heavy_modules": sorted(name for name in ("pandas", "psycopg2") if name in sys.modules),
+    "engine_created": db_manager._engine is not None,
+    "logging_configured": logger_manager.configured,
+}))
+"""
+
+
+def _import_server() -> tuple[dict, float]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+        # Тот же pythonpath, что pytest задаёт тестам (pyproject: pythonpath = ["src", "."])
+        env={**os.environ, "PYTHONPATH": os.pathsep.join([str(ROOT / "src"), str(ROOT)])},
+    )
+    # Строки importtime: "import time: <self us> | <cumulative us> | <module>"
+    cumulative_us = next(
+        int(line.split("|")[1])
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:") and line.split("|")[-1].strip() == "src.server"
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1]), cumulative_us / 1_000_000
+
+
+@pytest.mark.slow
+def test_server_import_is_lazy_and_within_budget():
+    state, seconds = _import_server()
+
+    assert state["heavy_modules"] == [], "heavy modules must be imported on demand"
+    assert not state["engine_created"], "engine must be created in the lifespan, not at import"
+    assert not state["logging_configured"], "logging must be configured in the lifespan, not at import"
+    assert seconds < IMPORT_TIME_BUDGET_SECONDS, f"src.server imports in {seconds:.2f}s"
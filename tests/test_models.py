@@ -0,0 +1,30 @@
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import Session, configure_mappers, make_transient_to_detached
+
+from src.models.base_model import ORMBase
+from src.models.user_models import User
+
+
+def test_relationships_raise_on_implicit_load():
+    configure_mappers()
+    lazy = {
+        f"{mapper.class_.__name__}.{relationship.key}": relationship.lazy
+        for mapper in ORMBase.registry.mappers
+        for relationship in mapper.relationships
+    }
+
+    assert lazy, "no relationships found"
+    # Неявная подгрузка — скрытые запросы; нужный граф запрос задаёт сам через options()
+    assert {name: strategy for name, strategy in lazy.items() if strategy != "raise"} == {}
+
+
+def test_unloaded_relationship_access_raises():
+    # Объект в сессии, как после загрузки из БД, но связи не подгружены через options()
+    user = User(id=1, organization_id=1, login="user")
+    make_transient_to_detached(user)
+    with Session() as session:
+        session.add(user)
+
+        with pytest.raises(InvalidRequestError, match="lazy='raise'"):
+            user.roles
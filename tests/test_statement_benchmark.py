@@ -0,0 +1,65 @@
+import timeit
+
+import pytest
+from sqlalchemy import bindparam, case, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import selectinload
+
+from src.models.user_models import Permission, Role, RolePermissions, User, UserIdentifier, UserRoles
+from src.services.auth_service import LOGIN_QUERY
+from src.services.principal_service import PRINCIPAL_QUERY
+
+NUMBER = 2000
+
+
+def build_login_query():
+    """Как запрос входа строился до вынесения в LOGIN_QUERY — заново на каждом вызове."""
+    return (
+        select(User, UserIdentifier.kind)
+        .options(selectinload(User.roles).selectinload(Role.permissions))
+        .join(UserIdentifier, UserIdentifier.user_id == User.id)
+        .where(UserIdentifier.identifier == bindparam("identifier"))
+        .order_by(case((UserIdentifier.kind == "nickname", 1), else_=0))
+        .limit(2)
+    )
+
+
+def build_principal_query():
+    return (
+        select(User.organization_id, User.is_active, User.is_blocked, User.is_deleted, Role.name, Permission.code)
+        .outerjoin(UserRoles, UserRoles.c.user_id == User.id)
+        .outerjoin(Role, Role.id == UserRoles.c.role_id)
+        .outerjoin(RolePermissions, RolePermissions.c.role_id == Role.id)
+        .outerjoin(Permission, Permission.id == RolePermissions.c.permission_id)
+        .where(User.id == bindparam("user_id"))
+    )
+
+
+def per_call_us(func) -> float:
+    return min(timeit.repeat(func, number=NUMBER, repeat=5)) / NUMBER * 1_000_000
+
+
+STATEMENTS = [
+    ("login", LOGIN_QUERY, build_login_query),
+    ("principal", PRINCIPAL_QUERY, build_principal_query),
+]
+
+
+@pytest.mark.parametrize("name, prebuilt, build", STATEMENTS)
+def test_prebuilt_statement_matches_rebuilt(name, prebuilt, build):
+    dialect = postgresql.dialect()
+    # Вынесенный в модуль запрос — тот же самый, что строился на каждом вызове
+    assert str(build().compile(dialect=dialect)) == str(prebuilt.compile(dialect=dialect))
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("name, prebuilt, build", STATEMENTS)
+def test_prebuilt_statement_overhead(name, prebuilt, build, record_property):
+    # Python-работа SQLAlchemy на запрос до обращения к БД: построение конструкции и ключ кэша компиляции
+    rebuilt_us = per_call_us(lambda: build()._generate_cache_key())
+    prebuilt_us = per_call_us(lambda: prebuilt._generate_cache_key())
+    # Попадают в отчёт (--junitxml) рядом с результатом теста
+    record_property(f"{name}_rebuilt_us", round(rebuilt_us, 1))
+    record_property(f"{name}_prebuilt_us", round(prebuilt_us, 1))
+
+    assert prebuilt_us < rebuilt_us, f"{name}: rebuilt {rebuilt_us:.1f} us, prebuilt {prebuilt_us:.1f} us"